@@ -1,12 +1,17 @@
 import os
-import json
+import queue
+import threading
 import tkinter as tk
-from tkinter import filedialog, ttk, messagebox
-import webbrowser
-from PyPDF2 import PdfMerger
-import pandas as pd
+from tkinter import filedialog, ttk, messagebox, simpledialog
+import merge_engine
+from file_metadata import FileMetadataService
+from session_store import SessionStore
 
-SESSION_FILE = "session.json"
+SESSION_FILE = "session.db"
+# Sessions were kept here before; imported once into SESSION_FILE
+LEGACY_SESSION_FILE = "session.json"
+# Session restore waits this long so the window paints first
+STARTUP_DELAY_MS = 50
 
 class ModernFileManager:
     def __init__(self, root):
@@ -22,11 +27,32 @@ class ModernFileManager:
         self.pdf_files = []
         self.excel_files = []
         self.current_tab = "pdf"
+        self.metadata = FileMetadataService()
+        # Opened in load_session; each tab's files are read when first shown
+        self.session = None
+        self.loaded_tabs = set()
+        
+        # Background merge state
+        self.merge_thread = None
+        self.merge_queue = queue.Queue()
+        self.cancel_event = threading.Event()
         
         # Configure styles
         self.setup_styles()
         self.create_ui()
+        self.update_file_display()
+        # Let the empty window paint before restoring the session; the
+        # restored files are stat'ed in the background by self.metadata
+        self.root.after(STARTUP_DELAY_MS, self.finish_startup)
+        self.poll_metadata()
+
+    def finish_startup(self):
         self.load_session()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        # Import the merge libraries before the first merge needs them,
+        # starting with the tab that is open
+        modes = ["pdf", "excel"] if self.current_tab == "pdf" else ["excel", "pdf"]
+        threading.Thread(target=merge_engine.preload, args=(modes,), daemon=True).start()
 
     def setup_styles(self):
         self.style = ttk.Style()
@@ -98,6 +124,23 @@ class ModernFileManager:
                            borderwidth=0,
                            focuscolor='none',
                            padding=(15, 8))
+        
+        self.style.configure('Files.Treeview',
+                           font=('Segoe UI', 10),
+                           background=colors['surface'],
+                           fieldbackground=colors['surface'],
+                           foreground=colors['text'],
+                           borderwidth=0,
+                           rowheight=32)
+        self.style.map('Files.Treeview',
+                       background=[('selected', colors['primary'])],
+                       foreground=[('selected', 'white')])
+        
+        self.style.configure('Files.Treeview.Heading',
+                           font=('Segoe UI', 10, 'bold'),
+                           background=colors['bg'],
+                           foreground=colors['text_secondary'],
+                           borderwidth=0)
 
     def create_ui(self):
         # Main container
@@ -208,25 +251,48 @@ class ModernFileManager:
                                    command=self.clear_all_files)
         self.clear_btn.pack(side='right')
         
-        # Scrollable file list
+        # Named selections, to come back to a set of files later
+        self.load_selection_btn = ttk.Button(list_header, text="Load Selection",
+                                            command=self.show_selection_menu)
+        self.load_selection_btn.pack(side='right', padx=(0, 10))
+        
+        self.save_selection_btn = ttk.Button(list_header, text="Save Selection",
+                                            command=self.save_selection)
+        self.save_selection_btn.pack(side='right', padx=(0, 10))
+        
+        # File list: a Treeview only draws the visible rows, so it stays fast
+        # with tens of thousands of files
         list_container = ttk.Frame(self.content_frame, style='Dark.TFrame')
         list_container.pack(fill='both', expand=True, pady=(0, 30))
         
-        # Canvas for scrolling
-        self.canvas = tk.Canvas(list_container, bg='#1a1a1a', highlightthickness=0, height=200)
-        scrollbar = ttk.Scrollbar(list_container, orient='vertical', command=self.canvas.yview)
-        self.scrollable_frame = ttk.Frame(self.canvas, style='Dark.TFrame')
-        
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
+        self.file_tree = ttk.Treeview(list_container, style='Files.Treeview',
+                                      columns=('name', 'folder', 'details', 'size', 'remove'),
+                                      show='headings', height=8)
+        self.file_tree.heading('name', text='Name', anchor='w')
+        self.file_tree.heading('folder', text='Folder', anchor='w')
+        self.file_tree.heading('details', text='Contents', anchor='w')
+        self.file_tree.heading('size', text='Size', anchor='e')
+        self.file_tree.heading('remove', text='')
+        self.file_tree.column('name', width=260, anchor='w')
+        self.file_tree.column('folder', width=300, anchor='w')
+        self.file_tree.column('details', width=170, stretch=False, anchor='w')
+        self.file_tree.column('size', width=90, stretch=False, anchor='e')
+        self.file_tree.column('remove', width=40, stretch=False, anchor='center')
+        
+        scrollbar = ttk.Scrollbar(list_container, orient='vertical', command=self.file_tree.yview)
+        self.file_tree.configure(yscrollcommand=scrollbar.set)
+        
+        self.file_tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
         
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
+        # Clicking the ✕ column removes that row, Delete removes the selection
+        self.file_tree.bind('<Button-1>', self.on_file_tree_click)
+        self.file_tree.bind('<Delete>', lambda e: self.remove_selected_files())
         
-        self.canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        # Empty state, shown over the list when there are no files
+        self.empty_label = tk.Label(list_container, text="",
+                                   font=('Segoe UI', 12),
+                                   bg='#2d2d2d', fg='#a1a1aa')
 
     def create_action_section(self):
         action_frame = ttk.Frame(self.content_frame, style='Dark.TFrame')
@@ -235,10 +301,18 @@ class ModernFileManager:
         # Progress bar (initially hidden)
         self.progress_frame = ttk.Frame(action_frame, style='Dark.TFrame')
         
-        self.progress_label = tk.Label(self.progress_frame, text="Processing...",
+        progress_header = ttk.Frame(self.progress_frame, style='Dark.TFrame')
+        progress_header.pack(fill='x', pady=(0, 5))
+        
+        self.progress_label = tk.Label(progress_header, text="Processing...",
                                       font=('Segoe UI', 10),
                                       bg='#1a1a1a', fg='#a1a1aa')
-        self.progress_label.pack(anchor='w', pady=(0, 5))
+        self.progress_label.pack(side='left', anchor='w')
+        
+        self.cancel_btn = ttk.Button(progress_header, text="Cancel",
+                                    style='Danger.TButton',
+                                    command=self.cancel_merge)
+        self.cancel_btn.pack(side='right')
         
         self.progress_bar = ttk.Progressbar(self.progress_frame, length=400)
         self.progress_bar.pack(fill='x')
@@ -276,7 +350,7 @@ class ModernFileManager:
                                bg='#1a1a1a', fg='#3b82f6',
                                cursor='hand2')
         credit_label.pack(side='left')
-        credit_label.bind("<Button-1>", lambda e: webbrowser.open("https://github.com/adilc0070"))
+        credit_label.bind("<Button-1>", lambda e: self.open_link("https://github.com/adilc0070"))
         
         version_label = tk.Label(footer_content, 
                                 text="v2.0",
@@ -284,8 +358,16 @@ class ModernFileManager:
                                 bg='#1a1a1a', fg='#a1a1aa')
         version_label.pack(side='right')
 
+    def open_link(self, url):
+        # Only needed when clicked, so kept out of startup
+        import webbrowser
+        webbrowser.open(url)
+
     def switch_tab(self, tab):
         self.current_tab = tab
+        if self.session is not None:
+            self.load_tab_files(tab)
+            self.session.set_setting("current_tab", tab)
         self.update_tab_styles()
         self.update_select_button()
         self.update_file_display()
@@ -318,117 +400,209 @@ class ModernFileManager:
             )
             current_list = self.excel_files
         
-        # Add new files
+        # Add new files, only the new rows are inserted into the list
+        known = set(current_list)
+        new_files = []
         for file_path in files:
-            if file_path not in current_list:
-                current_list.append(file_path)
+            if file_path not in known:
+                known.add(file_path)
+                new_files.append(file_path)
+        current_list.extend(new_files)
         
-        self.update_file_display()
-        self.save_session()
+        self.add_file_rows(new_files)
+        self.session.add_files(self.current_tab, new_files)
+
+    def current_files(self):
+        return self.pdf_files if self.current_tab == "pdf" else self.excel_files
 
     def update_file_display(self):
-        # Clear existing file widgets
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-        
-        current_files = self.pdf_files if self.current_tab == "pdf" else self.excel_files
-        
-        # Update header
+        # Full reload, only needed when the whole list changes (tab switch, session load)
+        children = self.file_tree.get_children()
+        if children:
+            self.file_tree.delete(*children)
+        self.add_file_rows(self.current_files())
+
+    def add_file_rows(self, paths):
+        # Rows appear immediately; sizes and counts are filled in as the
+        # metadata service reports them
+        for file_path in paths:
+            details, size = self.format_metadata(self.metadata.get(file_path))
+            self.file_tree.insert('', 'end', iid=file_path, values=(
+                os.path.basename(file_path),
+                os.path.dirname(file_path),
+                details,
+                size,
+                "✕"))
+        self.metadata.request(paths)
+        self.update_file_summary()
+
+    def format_metadata(self, info):
+        if info is None:
+            return "", "…"
+        if info.get("missing"):
+            return "File not found", "—"
+        
+        size = f"{info['size'] / (1024 * 1024):.1f} MB"
+        if "pages" in info:
+            details = f"{info['pages']:,} pages"
+        elif "rows" in info:
+            sheets = len(info["rows"])
+            details = f"{sheets} sheet{'s' if sheets != 1 else ''} • {sum(info['rows']):,} rows"
+        elif info.get("detail_pending"):
+            details = "…"
+        else:
+            details = ""
+        return details, size
+
+    def poll_metadata(self):
+        # Apply at most a batch of results per tick so big selections never stall the UI
+        changed = False
+        try:
+            for _ in range(500):
+                kind, path, info = self.metadata.results.get_nowait()
+                if kind == "detail" and self.session is not None and not info.get("detail_error"):
+                    # Remembered so the next start shows counts right away
+                    self.session.put_metadata(path, info)
+                if self.file_tree.exists(path):
+                    details, size = self.format_metadata(info)
+                    self.file_tree.set(path, 'details', details)
+                    self.file_tree.set(path, 'size', size)
+                    changed = True
+        except queue.Empty:
+            pass
+        
+        if changed:
+            self.update_file_summary()
+        self.root.after(100, self.poll_metadata)
+
+    def update_file_summary(self):
+        current_files = self.current_files()
         file_count = len(current_files)
         file_type = "PDF" if self.current_tab == "pdf" else "Excel"
         self.files_title.configure(text=f"Selected {file_type} Files ({file_count})")
         
         if not current_files:
-            # Show empty state
-            empty_frame = ttk.Frame(self.scrollable_frame, style='Dark.TFrame')
-            empty_frame.pack(fill='x', pady=20)
-            
-            empty_label = tk.Label(empty_frame, 
-                                  text=f"No {file_type.lower()} files selected yet",
-                                  font=('Segoe UI', 12),
-                                  bg='#1a1a1a', fg='#a1a1aa')
-            empty_label.pack()
-            
+            self.empty_label.configure(text=f"No {file_type.lower()} files selected yet")
+            self.empty_label.place(relx=0.5, rely=0.5, anchor='center')
             self.info_label.configure(text="No files selected")
             return
         
-        # Display files
+        self.empty_label.place_forget()
+        
+        # Totals over what is known so far, marked as estimates until every file reported
         total_size = 0
-        for i, file_path in enumerate(current_files):
-            self.create_file_item(file_path, i)
-            total_size += os.path.getsize(file_path)
+        total_units = 0
+        complete = True
+        for path in current_files:
+            info = self.metadata.get(path)
+            if info is None or info.get("size") is None:
+                complete = complete and info is not None
+                continue
+            total_size += info["size"]
+            if "pages" in info:
+                total_units += info["pages"]
+            elif "rows" in info:
+                # The merge reads each workbook's first sheet
+                total_units += info["rows"][0] if info["rows"] else 0
+            elif info.get("detail_pending"):
+                complete = False
         
-        # Update info
         size_mb = total_size / (1024 * 1024)
-        self.info_label.configure(text=f"{file_count} files • {size_mb:.1f} MB total")
-
-    def create_file_item(self, file_path, index):
-        # File item container
-        item_frame = tk.Frame(self.scrollable_frame, bg='#2d2d2d', relief='flat', bd=1)
-        item_frame.pack(fill='x', pady=2, padx=5)
-        
-        # File content
-        content_frame = tk.Frame(item_frame, bg='#2d2d2d')
-        content_frame.pack(fill='x', padx=15, pady=12)
-        
-        # File icon
-        icon = "📄" if self.current_tab == "pdf" else "📊"
-        icon_label = tk.Label(content_frame, text=icon, font=('Arial', 20),
-                             bg='#2d2d2d', fg='#3b82f6')
-        icon_label.pack(side='left', padx=(0, 15))
-        
-        # File info
-        info_frame = tk.Frame(content_frame, bg='#2d2d2d')
-        info_frame.pack(side='left', fill='x', expand=True)
-        
-        # File name
-        name_label = tk.Label(info_frame, text=os.path.basename(file_path),
-                             font=('Segoe UI', 11, 'bold'),
-                             bg='#2d2d2d', fg='#ffffff', anchor='w')
-        name_label.pack(fill='x')
-        
-        # File path and size
-        size_mb = os.path.getsize(file_path) / (1024 * 1024)
-        detail_text = f"{os.path.dirname(file_path)} • {size_mb:.1f} MB"
-        detail_label = tk.Label(info_frame, text=detail_text,
-                               font=('Segoe UI', 9),
-                               bg='#2d2d2d', fg='#a1a1aa', anchor='w')
-        detail_label.pack(fill='x')
-        
-        # Remove button
-        remove_btn = tk.Button(content_frame, text="✕", font=('Arial', 12, 'bold'),
-                              bg='#2d2d2d', fg='#ef4444', bd=0,
-                              cursor='hand2', activebackground='#ef4444',
-                              activeforeground='white',
-                              command=lambda: self.remove_file(index))
-        remove_btn.pack(side='right', padx=(10, 0))
-
-    def remove_file(self, index):
-        current_files = self.pdf_files if self.current_tab == "pdf" else self.excel_files
-        if 0 <= index < len(current_files):
-            del current_files[index]
-            self.update_file_display()
-            self.save_session()
+        unit = "pages" if self.current_tab == "pdf" else "rows"
+        approx = "" if complete else "~"
+        self.info_label.configure(
+            text=f"{file_count} files • {approx}{size_mb:.1f} MB total • {approx}{total_units:,} {unit}")
+
+    def on_file_tree_click(self, event):
+        if self.file_tree.identify_region(event.x, event.y) != 'cell':
+            return
+        if self.file_tree.identify_column(event.x) != '#5':
+            return
+        row = self.file_tree.identify_row(event.y)
+        if row:
+            self.remove_file(row)
+            return 'break'
+
+    def remove_file(self, file_path):
+        current_files = self.current_files()
+        if file_path in current_files:
+            current_files.remove(file_path)
+            self.file_tree.delete(file_path)
+            self.update_file_summary()
+            self.session.remove_files(self.current_tab, [file_path])
+
+    def remove_selected_files(self):
+        selected = set(self.file_tree.selection())
+        if not selected:
+            return
+        current_files = self.current_files()
+        current_files[:] = [path for path in current_files if path not in selected]
+        self.file_tree.delete(*selected)
+        self.update_file_summary()
+        self.session.remove_files(self.current_tab, selected)
 
     def clear_all_files(self):
-        if self.current_tab == "pdf":
-            self.pdf_files.clear()
-        else:
-            self.excel_files.clear()
+        self.current_files().clear()
         self.update_file_display()
-        self.save_session()
+        self.session.clear_files(self.current_tab)
+
+    def save_selection(self):
+        files = self.current_files()
+        if not files:
+            messagebox.showwarning("No Files", "Select some files before saving a selection.")
+            return
+        name = simpledialog.askstring("Save Selection", "Name for this selection:", parent=self.root)
+        if name and name.strip():
+            self.session.save_selection(name.strip(), self.current_tab, files)
+
+    def show_selection_menu(self):
+        selections = self.session.list_selections(self.current_tab)
+        menu = tk.Menu(self.root, tearoff=0)
+        if not selections:
+            menu.add_command(label="No saved selections", state='disabled')
+        else:
+            delete_menu = tk.Menu(menu, tearoff=0)
+            for name, _, count in selections:
+                menu.add_command(label=f"{name} ({count:,} files)",
+                                 command=lambda name=name: self.load_selection(name))
+                delete_menu.add_command(label=name,
+                                        command=lambda name=name: self.session.delete_selection(name))
+            menu.add_separator()
+            menu.add_cascade(label="Delete", menu=delete_menu)
+        button = self.load_selection_btn
+        try:
+            menu.tk_popup(button.winfo_rootx(), button.winfo_rooty() + button.winfo_height())
+        finally:
+            menu.grab_release()
+
+    def load_selection(self, name):
+        selection = self.session.load_selection(name)
+        if selection is None:
+            return
+        mode, paths = selection
+        # Replaces the tab's list, like selecting those files into an empty list
+        if mode == "pdf":
+            self.pdf_files = list(paths)
+        else:
+            self.excel_files = list(paths)
+        self.loaded_tabs.add(mode)
+        self.session.clear_files(mode)
+        self.session.add_files(mode, paths)
+        self.switch_tab(mode)
 
     def show_progress(self, text="Processing...", value=0):
         self.progress_frame.pack(fill='x', pady=(0, 20))
         self.progress_label.configure(text=text)
         self.progress_bar.configure(mode='determinate', value=value)
-        self.root.update()
 
     def hide_progress(self):
         self.progress_frame.pack_forget()
 
     def merge_files(self):
-        current_files = self.pdf_files if self.current_tab == "pdf" else self.excel_files
+        if self.merge_thread is not None:
+            return
+        
+        current_files = self.current_files()
         
         if not current_files:
             messagebox.showwarning("No Files", f"Please select {self.current_tab.upper()} files to merge.")
@@ -438,97 +612,123 @@ class ModernFileManager:
         file_type = "PDF" if self.current_tab == "pdf" else "Excel"
         ext = ".pdf" if self.current_tab == "pdf" else ".xlsx"
         
+        filetypes = [(f"{file_type} file", f"*{ext}")]
+        if self.current_tab == "excel":
+            # The output format follows the chosen extension
+            filetypes += [("CSV file", "*.csv"), ("Parquet file", "*.parquet"),
+                          ("Feather file", "*.feather")]
+        
         output_path = filedialog.asksaveasfilename(
             title=f"Save merged {file_type} file",
             defaultextension=ext,
-            filetypes=[(f"{file_type} file", f"*{ext}")]
+            filetypes=filetypes
         )
         
         if not output_path:
             return
         
+        # Merge a snapshot of the list so edits during the merge don't affect it
+        mode = self.current_tab
+        files = list(current_files)
+        
+        self.cancel_event.clear()
+        self.merge_btn.state(['disabled'])
+        self.cancel_btn.state(['!disabled'])
+        self.show_progress("Starting merge...", 0)
+        
+        self.merge_thread = threading.Thread(target=self.run_merge,
+                                             args=(mode, files, output_path),
+                                             daemon=True)
+        self.merge_thread.start()
+        self.root.after(100, self.poll_merge_queue)
+
+    def run_merge(self, mode, files, output_path):
+        # Runs on the worker thread: never touch Tk widgets here, only post to the queue
+        def progress(text="Processing...", value=0):
+            self.merge_queue.put(("progress", text, value))
+        
         try:
-            if self.current_tab == "pdf":
-                self.merge_pdfs(current_files, output_path)
+            if mode == "pdf":
+                total_files = merge_engine.merge_pdfs(files, output_path, progress, self.cancel_event)
             else:
-                self.merge_excels(current_files, output_path)
+                total_files = merge_engine.merge_excels(files, output_path, progress, self.cancel_event)
+            self.merge_queue.put(("done", mode, total_files, output_path))
+        except merge_engine.MergeCancelled:
+            self.merge_queue.put(("cancelled",))
         except Exception as e:
-            self.hide_progress()
-            messagebox.showerror("Error", f"Failed to merge files:\n{str(e)}")
+            self.merge_queue.put(("error", e))
 
-    def merge_pdfs(self, files, output_path):
-        total_files = len(files)
-        merger = PdfMerger()
-        
+    def poll_merge_queue(self):
+        finished = False
         try:
-            for i, pdf_path in enumerate(files):
-                progress = int((i / total_files) * 90)
-                self.show_progress(f"Processing {os.path.basename(pdf_path)}...", progress)
-                merger.append(pdf_path)
-            
-            self.show_progress("Saving merged PDF...", 95)
-            merger.write(output_path)
-            merger.close()
-            
+            while True:
+                message = self.merge_queue.get_nowait()
+                kind = message[0]
+                if kind == "progress":
+                    self.show_progress(message[1], message[2])
+                else:
+                    finished = True
+                    self.finish_merge(message)
+        except queue.Empty:
+            pass
+        
+        if not finished:
+            self.root.after(100, self.poll_merge_queue)
+
+    def finish_merge(self, message):
+        self.merge_thread = None
+        self.merge_btn.state(['!disabled'])
+        kind = message[0]
+        
+        if kind == "done":
+            _, mode, total_files, output_path = message
+            file_type = "PDF" if mode == "pdf" else "Excel"
             self.show_progress("Complete!", 100)
             self.root.after(1000, self.hide_progress)
-            
-            messagebox.showinfo("Success", f"Successfully merged {total_files} PDF files!\n\nSaved to: {output_path}")
-            
-        except Exception as e:
-            merger.close()
-            raise e
+            messagebox.showinfo("Success", f"Successfully merged {total_files} {file_type} files!\n\nSaved to: {output_path}")
+        elif kind == "cancelled":
+            self.hide_progress()
+            messagebox.showinfo("Cancelled", "Merge cancelled.")
+        else:
+            self.hide_progress()
+            messagebox.showerror("Error", f"Failed to merge files:\n{str(message[1])}")
 
-    def merge_excels(self, files, output_path):
-        total_files = len(files)
-        all_data = []
-        
+    def cancel_merge(self):
+        if self.merge_thread is not None:
+            self.cancel_event.set()
+            self.cancel_btn.state(['disabled'])
+            self.progress_label.configure(text="Cancelling...")
+
+    def load_session(self):
+        # Only the open tab's files are read now; the other tab's on first switch
         try:
-            for i, excel_path in enumerate(files):
-                progress = int((i / total_files) * 80)
-                self.show_progress(f"Reading {os.path.basename(excel_path)}...", progress)
-                
-                df = pd.read_excel(excel_path)
-                df['Source_File'] = os.path.basename(excel_path)
-                all_data.append(df)
-            
-            self.show_progress("Combining data...", 90)
-            combined_df = pd.concat(all_data, ignore_index=True)
-            
-            self.show_progress("Saving merged Excel file...", 95)
-            combined_df.to_excel(output_path, index=False)
-            
-            self.show_progress("Complete!", 100)
-            self.root.after(1000, self.hide_progress)
-            
-            messagebox.showinfo("Success", f"Successfully merged {total_files} Excel files!\n\nSaved to: {output_path}")
-            
+            self.session = SessionStore(SESSION_FILE, LEGACY_SESSION_FILE)
         except Exception as e:
-            raise e
+            print("Could not load session:", e)
+            self.session = SessionStore(":memory:")
+        self.switch_tab(self.session.get_setting("current_tab", "pdf"))
 
-    def save_session(self):
-        data = {
-            "pdf_files": self.pdf_files,
-            "excel_files": self.excel_files,
-            "current_tab": self.current_tab
-        }
+    def load_tab_files(self, tab):
+        if tab in self.loaded_tabs:
+            return
+        self.loaded_tabs.add(tab)
         try:
-            with open(SESSION_FILE, "w") as f:
-                json.dump(data, f)
+            files = self.session.load_files(tab)
+            self.metadata.seed(self.session.load_metadata(tab))
         except Exception as e:
-            print("Could not save session:", e)
+            print("Could not load session:", e)
+            return
+        if tab == "pdf":
+            self.pdf_files = files
+        else:
+            self.excel_files = files
 
-    def load_session(self):
-        if os.path.exists(SESSION_FILE):
-            try:
-                with open(SESSION_FILE, "r") as f:
-                    data = json.load(f)
-                    self.pdf_files = data.get("pdf_files", [])
-                    self.excel_files = data.get("excel_files", [])
-                    self.current_tab = data.get("current_tab", "pdf")
-                    self.switch_tab(self.current_tab)
-            except Exception as e:
-                print("Could not load session:", e)
+    def on_close(self):
+        # Commit the last changes before the window goes away
+        if self.session is not None:
+            self.session.close()
+        self.metadata.shutdown()
+        self.root.destroy()
 
 # Run the application
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+# Reconciles the columns of workbooks before they are combined: headers are
+# matched ignoring case and extra whitespace (with optional rename rules), and
+# every column gets one dtype across all files, so pd.concat never has to fall
+# back to object columns.
+
+
+def header_key(name):
+    # "  Customer   ID" and "customer id" are the same column
+    if not isinstance(name, str):
+        return name
+    return " ".join(name.split()).casefold()
+
+
+def clean_header(name, rename=None):
+    # Collapses whitespace, then applies rename rules ({old: new}, matched
+    # like headers are)
+    if not isinstance(name, str):
+        return name
+    name = " ".join(name.split())
+    if rename:
+        for old, new in rename.items():
+            if header_key(old) == header_key(name):
+                return new
+    return name
+
+
+def merge_headers(column_lists):
+    # Returns (columns, {key: column}): the union of the columns in
+    # first-seen order, each spelled as it first appeared
+    columns = []
+    canonical = {}
+    for file_columns in column_lists:
+        for column in file_columns:
+            key = header_key(column)
+            if key not in canonical:
+                canonical[key] = column
+                columns.append(column)
+    return columns, canonical
+
+
+def align_columns(df, canonical):
+    # Renames df's columns to their canonical spelling; a column that appears
+    # twice under different spellings keeps its first occurrence
+    renamed = [canonical.get(header_key(column), column) for column in df.columns]
+    if renamed != list(df.columns):
+        df = df.set_axis(renamed, axis=1)
+    if df.columns.duplicated().any():
+        df = df.loc[:, ~df.columns.duplicated()]
+    return df
+
+
+def is_text(values):
+    # True when every non-blank value is a str
+    from pandas import StringDtype
+    from pandas.api.types import infer_dtype
+
+    if isinstance(values.dtype, StringDtype):
+        return True
+    return values.dtype == object and infer_dtype(values, skipna=True) in ("string", "empty")
+
+
+def common_dtype(dtypes, has_missing, textual=False):
+    # One dtype for a column given the dtypes it has in the frames that hold
+    # values for it (all-empty columns don't count). has_missing is true when
+    # some frames lack the column, so the result must hold missing values;
+    # textual is true when all of the column's values are str (see is_text).
+    # Returns None when no cast is needed or possible.
+    from pandas import CategoricalDtype
+    from pandas.api import types
+
+    if not dtypes:
+        return None
+    first = dtypes[0]
+    if all(type(dtype) is type(first) and dtype == first for dtype in dtypes) and first != object:
+        # Already one dtype; only bool and int columns can't hold blanks
+        if not has_missing or not (types.is_bool_dtype(first) or types.is_integer_dtype(first)):
+            return None
+
+    if all(types.is_bool_dtype(dtype) for dtype in dtypes):
+        return "boolean" if has_missing else "bool"
+    if all(types.is_integer_dtype(dtype) for dtype in dtypes):
+        return "Int64" if has_missing else "int64"
+    if all(types.is_numeric_dtype(dtype) and not types.is_bool_dtype(dtype) for dtype in dtypes):
+        return "float64"
+    if all(types.is_datetime64_any_dtype(dtype) for dtype in dtypes):
+        return "datetime64[ns]"
+    if all(isinstance(dtype, CategoricalDtype) for dtype in dtypes):
+        return None
+    # Text is stored as text rather than as Python objects. Values of
+    # different kinds stay objects, so numbers are still written as numbers.
+    return "string" if textual else None
+
+
+def unify_frames(frames):
+    # Aligns the headers of frames (already passed through clean_header) and
+    # casts each column to one dtype across them. Returns the new frames,
+    # ready to be concatenated.
+    columns, canonical = merge_headers([df.columns for df in frames])
+    frames = [align_columns(df, canonical) for df in frames]
+
+    targets = {}
+    for column in columns:
+        dtypes = []
+        has_missing = False
+        textual = True
+        blank = False
+        for df in frames:
+            if column not in df.columns:
+                has_missing = has_missing or len(df) > 0
+                continue
+            values = df[column]
+            if len(values) and values.isna().all():
+                # Only blanks here: says nothing about the type, but they
+                # have to be representable
+                has_missing = True
+                blank = True
+                continue
+            if values.hasnans:
+                has_missing = True
+            dtypes.append(values.dtype)
+            textual = textual and is_text(values)
+        target = common_dtype(dtypes, has_missing, textual)
+        if target is None and blank and dtypes and str(dtypes[0]) not in ("object", "category") and \
+                all(str(dtype) == str(dtypes[0]) for dtype in dtypes):
+            # The other files agree, so the blank ones (read as float) follow them
+            target = str(dtypes[0])
+        if target is not None:
+            targets[column] = target
+
+    unified = []
+    for df in frames:
+        casts = {}
+        for column, target in targets.items():
+            if column in df.columns and str(df[column].dtype) != target:
+                casts[column] = target
+        if casts:
+            df = _cast(df, casts)
+        unified.append(df)
+    return unified
+
+
+def _cast(df, casts):
+    # Only the cast columns are replaced; the rest of the data isn't copied
+    df = df.copy(deep=False)
+    for column, target in casts.items():
+        values = df[column]
+        if target in ("Int64", "boolean") and values.isna().all():
+            # A column of blanks comes in as float
+            values = values.astype("float64")
+        try:
+            df[column] = values.astype(target)
+        except (TypeError, ValueError):
+            # Values that don't fit after all are kept, as text
+            df[column] = values.astype("string")
+    return df
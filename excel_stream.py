@@ -0,0 +1,81 @@
+from openpyxl import Workbook, load_workbook
+
+# Excel's hard limit per worksheet, including the header row
+MAX_SHEET_ROWS = 1048576
+
+
+def sheet_title(name):
+    # Excel sheet names are at most 31 characters and can't contain []:*?/\
+    for char in '[]:*?/\\':
+        name = name.replace(char, '_')
+    return name[:31] or "Sheet"
+
+
+class StreamingExcelWriter:
+    # Appends rows to a write-only workbook, which openpyxl spools to disk as
+    # they arrive. Starts a new sheet (with its own header) whenever the
+    # current one reaches Excel's row limit. Several writers can share one
+    # workbook, each filling the sheets named after its title.
+
+    def __init__(self, columns, max_rows=MAX_SHEET_ROWS, workbook=None, title=None):
+        self.columns = list(columns)
+        self.max_rows = max_rows
+        self.workbook = workbook if workbook is not None else Workbook(write_only=True)
+        self.title = title
+        self.sheet = None
+        self.sheet_rows = 0
+        self.sheet_count = 0
+        self.total_rows = 0
+
+    def new_sheet(self):
+        self.sheet_count += 1
+        if self.title is None:
+            name = f"Sheet{self.sheet_count}"
+        elif self.sheet_count == 1:
+            name = sheet_title(self.title)
+        else:
+            suffix = f" ({self.sheet_count})"
+            name = sheet_title(self.title)[:31 - len(suffix)] + suffix
+        self.sheet = self.workbook.create_sheet(name)
+        self.sheet.append([str(column) for column in self.columns])
+        self.sheet_rows = 1
+
+    def ensure_sheet(self):
+        # Even a writer that got no rows leaves a sheet with its header
+        if self.sheet is None:
+            self.new_sheet()
+
+    def append_frame(self, df):
+        # Missing columns become empty cells, NaN/NaT become blanks
+        df = df.reindex(columns=self.columns)
+        df = df.astype(object).where(df.notna(), None)
+        for row in df.itertuples(index=False, name=None):
+            self.append_row(row)
+
+    def append_row(self, row):
+        if self.sheet is None or self.sheet_rows >= self.max_rows:
+            self.new_sheet()
+        self.sheet.append(row)
+        self.sheet_rows += 1
+        self.total_rows += 1
+
+    @classmethod
+    def append_to(cls, output_path, max_rows=MAX_SHEET_ROWS):
+        # Reopens an existing merged workbook to add rows after its last sheet's
+        # data; the header of the first sheet gives the column order. openpyxl
+        # can only do this by loading and saving the whole workbook, so the
+        # cost grows with the output, not with the rows added.
+        writer = cls([], max_rows)
+        writer.workbook = load_workbook(output_path)
+        first_row = next(writer.workbook.worksheets[0].iter_rows(min_row=1, max_row=1, values_only=True), ())
+        # Headers are matched as the text this writer writes them as, also
+        # where pandas stored a numeric header as a number
+        writer.columns = [column if column is None else str(column) for column in first_row]
+        writer.sheet = writer.workbook.worksheets[-1]
+        writer.sheet_rows = writer.sheet.max_row
+        writer.sheet_count = len(writer.workbook.worksheets)
+        return writer
+
+    def save(self, output_path):
+        self.ensure_sheet()
+        self.workbook.save(output_path)
@@ -0,0 +1,115 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PDF_EXTENSIONS = (".pdf",)
+WORKBOOK_EXTENSIONS = (".xlsx", ".xlsm")
+
+
+def count_pdf_pages(pdf_path):
+    from PyPDF2 import PdfReader
+
+    with open(pdf_path, "rb") as fh:
+        return len(PdfReader(fh).pages)
+
+
+def count_workbook_rows(excel_path):
+    # Read-only mode takes row counts from each sheet's dimension record
+    # instead of loading the cells
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(excel_path, read_only=True)
+    try:
+        rows = []
+        for sheet in workbook.worksheets:
+            max_row = sheet.max_row
+            if max_row is None:
+                # No dimension record, fall back to walking the rows
+                max_row = sum(1 for _ in sheet.iter_rows(values_only=True))
+            # The header row isn't data
+            rows.append(max(max_row - 1, 0))
+        return rows
+    finally:
+        workbook.close()
+
+
+class FileMetadataService:
+    # Collects file metadata off the UI thread. Sizes are stat'ed on a wide
+    # pool (cheap, but slow on network shares), while page and row counts run
+    # on a small pool afterwards so they never hold up the sizes. Results are
+    # cached per path and posted to `results` as ("stat" | "detail", path, info)
+    # for the UI to pick up.
+
+    def __init__(self, stat_workers=8, detail_workers=2):
+        self.results = queue.Queue()
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.stat_pool = ThreadPoolExecutor(max_workers=stat_workers)
+        self.detail_pool = ThreadPoolExecutor(max_workers=detail_workers)
+
+    def get(self, path):
+        with self.lock:
+            info = self.cache.get(path)
+            return dict(info) if info is not None else None
+
+    def seed(self, infos):
+        # Counts remembered from an earlier run; request() still re-stats the
+        # files and drops the counts of any that changed since
+        with self.lock:
+            for path, info in infos.items():
+                if path not in self.cache:
+                    self.cache[path] = {key: value for key, value in info.items()
+                                        if key != "detail_pending"}
+
+    def request(self, paths):
+        for path in paths:
+            self.stat_pool.submit(self._stat, path)
+
+    def _stat(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            info = {"size": None, "missing": True}
+            with self.lock:
+                self.cache[path] = info
+            self.results.put(("stat", path, dict(info)))
+            return
+
+        with self.lock:
+            info = self.cache.get(path)
+            # A changed file loses its page/row counts along with its old size
+            if info is None or info.get("size") != st.st_size or info.get("mtime") != st.st_mtime:
+                info = {"size": st.st_size, "mtime": st.st_mtime}
+                self.cache[path] = info
+            needs_detail = "pages" not in info and "rows" not in info and not info.get("detail_pending")
+            if needs_detail:
+                info["detail_pending"] = True
+            snapshot = dict(info)
+
+        self.results.put(("stat", path, snapshot))
+        if needs_detail:
+            self.detail_pool.submit(self._detail, path)
+
+    def _detail(self, path):
+        detail = {}
+        ext = os.path.splitext(path)[1].lower()
+        try:
+            if ext in PDF_EXTENSIONS:
+                detail["pages"] = count_pdf_pages(path)
+            elif ext in WORKBOOK_EXTENSIONS:
+                detail["rows"] = count_workbook_rows(path)
+        except Exception:
+            # Unreadable files still get listed, just without counts
+            detail["detail_error"] = True
+
+        with self.lock:
+            info = self.cache.setdefault(path, {})
+            info.update(detail)
+            info.pop("detail_pending", None)
+            snapshot = dict(info)
+        self.results.put(("detail", path, snapshot))
+
+    def shutdown(self):
+        self.stat_pool.shutdown(wait=False)
+        self.detail_pool.shutdown(wait=False)
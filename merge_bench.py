@@ -0,0 +1,343 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import multiprocessing
+
+import merge_engine
+
+# Bumped whenever the generated files change, so old corpora are rebuilt
+CORPUS_VERSION = 2
+
+# Corpus sizes per scale: (files, pages per file) for PDFs, (files, rows, columns) for workbooks
+SCALES = {
+    "small": {
+        "pdf_many_small": (100, 2),
+        "pdf_few_huge": (2, 300),
+        "excel_tall": (4, 5000, 8),
+        "excel_wide": (4, 300, 150),
+    },
+    "medium": {
+        "pdf_many_small": (1000, 3),
+        "pdf_few_huge": (3, 3000),
+        "excel_tall": (8, 100000, 8),
+        "excel_wide": (8, 5000, 200),
+    },
+    "large": {
+        "pdf_many_small": (5000, 3),
+        "pdf_few_huge": (4, 10000),
+        "excel_tall": (16, 250000, 10),
+        "excel_wide": (16, 20000, 200),
+    },
+}
+
+# (corpus, mode name, merge keyword arguments)
+CASES = [
+    ("pdf_many_small", "default", {}),
+    ("pdf_many_small", "streaming", {"streaming": True}),
+    ("pdf_many_small", "optimize", {"optimize": True}),
+    ("pdf_few_huge", "default", {}),
+    ("pdf_few_huge", "streaming", {"streaming": True}),
+    ("excel_tall", "default", {}),
+    ("excel_tall", "streaming", {"streaming": True}),
+    ("excel_tall", "parallel", {"workers": 0}),
+    ("excel_tall", "csv", {"streaming": True, "output_format": "csv"}),
+    ("excel_tall", "parquet", {"streaming": True, "output_format": "parquet"}),
+    ("excel_wide", "default", {}),
+    ("excel_wide", "streaming", {"streaming": True}),
+    ("excel_wide", "parallel", {"workers": 0}),
+]
+
+# Budget for importing the GUI and painting its window, and the libraries
+# that must not be imported before the first merge
+STARTUP_TARGET_SECONDS = 0.5
+HEAVY_MODULES = ("pandas", "PyPDF2", "openpyxl", "pyarrow")
+
+
+def make_pdf(path, pages, page_text_lines=40):
+    # Like the output of a report generator: every file embeds the same font
+    # and logo image, and each page has its own text
+    from PyPDF2 import PdfWriter, PageObject
+    from PyPDF2.generic import (DecodedStreamObject, DictionaryObject, NameObject, NumberObject,
+                                ArrayObject)
+
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    font_ref = writer._add_object(font)
+    logo = DecodedStreamObject()
+    logo.set_data(bytes((x * 7 + y * 13) % 256 for y in range(96) for x in range(96)))
+    logo.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(96),
+        NameObject("/Height"): NumberObject(96),
+        NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+    })
+    logo_ref = writer._add_object(logo)
+
+    for page_number in range(pages):
+        # add_page copies the page, so it has to be complete before it is added
+        page = PageObject.create_blank_page(None, 612, 792)
+        lines = [f"BT /F1 10 Tf 40 {700 - i * 16} Td (Synthetic page {page_number} line {i} "
+                 f"lorem ipsum dolor sit amet) Tj ET" for i in range(page_text_lines)]
+        content = DecodedStreamObject()
+        content.set_data(("q 48 0 0 48 40 730 cm /Logo Do Q\n" + "\n".join(lines)).encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font_ref}),
+            NameObject("/XObject"): DictionaryObject({NameObject("/Logo"): logo_ref}),
+            NameObject("/ProcSet"): ArrayObject([NameObject("/PDF"), NameObject("/Text"),
+                                                 NameObject("/ImageB")]),
+        })
+        writer.add_page(page)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def make_workbook(path, rows, columns, seed):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Data")
+    sheet.append([f"col_{c}" for c in range(columns)])
+    for r in range(rows):
+        value = seed * 1000003 + r
+        sheet.append([value + c if c % 3 else f"text {value % 9973}-{c}" for c in range(columns)])
+    workbook.save(path)
+
+
+def build_corpus(corpus_dir, scale):
+    # Generated once per scale and reused; the spec file records what is there
+    spec = SCALES[scale]
+    spec_path = os.path.join(corpus_dir, "corpus.json")
+    expected = {"version": CORPUS_VERSION, "scale": scale, "spec": {k: list(v) for k, v in spec.items()}}
+    try:
+        with open(spec_path, "r") as f:
+            if json.load(f) == expected:
+                return
+    except (OSError, ValueError):
+        pass
+
+    print(f"Generating {scale} corpus in {corpus_dir}...", file=sys.stderr)
+    for name, params in spec.items():
+        folder = os.path.join(corpus_dir, name)
+        os.makedirs(folder, exist_ok=True)
+        if name.startswith("pdf"):
+            files, pages = params
+            for i in range(files):
+                make_pdf(os.path.join(folder, f"{i:05d}.pdf"), pages)
+        else:
+            files, rows, columns = params
+            for i in range(files):
+                make_workbook(os.path.join(folder, f"{i:05d}.xlsx"), rows, columns, i)
+
+    with open(spec_path, "w") as f:
+        json.dump(expected, f)
+
+
+def corpus_files(corpus_dir, name):
+    folder = os.path.join(corpus_dir, name)
+    return [os.path.join(folder, f) for f in sorted(os.listdir(folder))]
+
+
+def _run_case(corpus, files, output_path, kwargs, results):
+    # Runs in a fresh process so peak memory belongs to this case alone (the
+    # parallel modes' worker processes are not included)
+    from merge_metrics import MergeMetrics
+
+    metrics = MergeMetrics()
+    start = time.perf_counter()
+    if corpus.startswith("pdf"):
+        merge_engine.merge_pdfs(files, output_path, metrics=metrics, **kwargs)
+    else:
+        merge_engine.merge_excels(files, output_path, metrics=metrics, **kwargs)
+    results.put({
+        "wall_seconds": time.perf_counter() - start,
+        "peak_rss_bytes": merge_engine.peak_rss(),
+        "stages": metrics.summary(),
+    })
+
+
+def run_case(corpus_dir, scale, corpus, mode, kwargs, work_dir):
+    files = corpus_files(corpus_dir, corpus)
+    is_pdf = corpus.startswith("pdf")
+    extension = "pdf" if is_pdf else kwargs.get("output_format", "xlsx")
+    output_path = os.path.join(work_dir, f"{corpus}-{mode}.{extension}")
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run_case, args=(corpus, files, output_path, kwargs, results))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        return {"corpus": corpus, "mode": mode, "error": f"exit code {process.exitcode}"}
+    measured = results.get()
+
+    # files * pages per file, or files * rows per file
+    spec = SCALES[scale][corpus]
+    unit = "pages" if is_pdf else "rows"
+    items = spec[0] * spec[1]
+
+    result = {
+        "corpus": corpus,
+        "mode": mode,
+        "files": len(files),
+        "input_bytes": sum(os.path.getsize(f) for f in files),
+        "output_bytes": os.path.getsize(output_path),
+        "unit": unit,
+        "items": items,
+        "wall_seconds": round(measured["wall_seconds"], 4),
+        "items_per_second": round(items / measured["wall_seconds"], 1),
+        "peak_rss_bytes": measured["peak_rss_bytes"],
+        # Seconds per merge stage, to see where the time in a regression went
+        "stages": {name: round(total["seconds"], 4) for name, total in measured["stages"].items()},
+    }
+    os.remove(output_path)
+    return result
+
+
+def _startup_probe(results):
+    # Runs in a fresh process so no library is already imported
+    start = time.perf_counter()
+    import EasyMerge
+    import_seconds = time.perf_counter() - start
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    paint_seconds = None
+    try:
+        root = EasyMerge.tk.Tk()
+    except EasyMerge.tk.TclError:
+        # No display: only the import can be measured
+        root = None
+    if root is not None:
+        EasyMerge.ModernFileManager(root)
+        root.update()
+        paint_seconds = time.perf_counter() - start
+        heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+        root.destroy()
+
+    results.put({"import_seconds": import_seconds, "paint_seconds": paint_seconds, "heavy": heavy})
+
+
+def check_startup(runs=3):
+    # Best of a few runs, so a busy machine doesn't fail the check
+    context = multiprocessing.get_context("spawn")
+    measured = []
+    for _ in range(runs):
+        results = context.Queue()
+        process = context.Process(target=_startup_probe, args=(results,))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"FAIL: startup probe exited with code {process.exitcode}")
+            return 1
+        measured.append(results.get())
+
+    best = min(measured, key=lambda m: m["paint_seconds"] or m["import_seconds"])
+    seconds = best["paint_seconds"] or best["import_seconds"]
+    what = "first paint" if best["paint_seconds"] is not None else "import (no display)"
+    print(f"Startup {what}: {seconds:.3f}s (target {STARTUP_TARGET_SECONDS:.2f}s)")
+
+    failed = False
+    if seconds > STARTUP_TARGET_SECONDS:
+        print("FAIL: startup is over target")
+        failed = True
+    if best["heavy"]:
+        print("FAIL: imported at startup: " + ", ".join(best["heavy"]))
+        failed = True
+    return 1 if failed else 0
+
+
+def print_results(results):
+    print(f"{'corpus':<16} {'mode':<10} {'seconds':>9} {'throughput':>18} {'peak MB':>9} {'out MB':>8}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['corpus']:<16} {r['mode']:<10} {r['error']}")
+            continue
+        peak = "-" if r["peak_rss_bytes"] is None else f"{r['peak_rss_bytes'] / (1024 * 1024):.1f}"
+        throughput = f"{r['items_per_second']:,.0f} {r['unit']}/s"
+        print(f"{r['corpus']:<16} {r['mode']:<10} {r['wall_seconds']:>9.2f} {throughput:>18} {peak:>9} "
+              f"{r['output_bytes'] / (1024 * 1024):>8.2f}")
+
+
+def compare(baseline_path, current_path):
+    # Ratios above 1.0 mean the current run is slower / uses more memory
+    with open(baseline_path, "r") as f:
+        baseline = {(r["corpus"], r["mode"]): r for r in json.load(f)["results"]}
+    with open(current_path, "r") as f:
+        current = json.load(f)["results"]
+
+    print(f"{'corpus':<16} {'mode':<10} {'time ratio':>11} {'memory ratio':>13}")
+    for r in current:
+        old = baseline.get((r["corpus"], r["mode"]))
+        if old is None or "error" in r or "error" in old:
+            continue
+        time_ratio = r["wall_seconds"] / old["wall_seconds"]
+        if r["peak_rss_bytes"] and old["peak_rss_bytes"]:
+            memory_ratio = f"{r['peak_rss_bytes'] / old['peak_rss_bytes']:.2f}"
+        else:
+            memory_ratio = "-"
+        print(f"{r['corpus']:<16} {r['mode']:<10} {time_ratio:>11.2f} {memory_ratio:>13}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m merge_bench",
+        description="Benchmark the PDF and Excel merge modes on synthetic corpora")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--corpus-dir", help="where corpora are generated and reused "
+                                             "(default: ./bench_corpus/SCALE)")
+    parser.add_argument("--only", action="append", default=[],
+                        help="run only cases whose 'corpus/mode' contains this text; repeatable")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two result files instead of running")
+    parser.add_argument("--startup", action="store_true",
+                        help="check GUI startup time against its target instead of running; "
+                             "exits with status 1 when it is over target")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        return check_startup()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    corpus_dir = args.corpus_dir or os.path.join("bench_corpus", args.scale)
+    os.makedirs(corpus_dir, exist_ok=True)
+    build_corpus(corpus_dir, args.scale)
+
+    work_dir = os.path.join(corpus_dir, "out")
+    os.makedirs(work_dir, exist_ok=True)
+
+    results = []
+    for corpus, mode, kwargs in CASES:
+        if args.only and not any(text in f"{corpus}/{mode}" for text in args.only):
+            continue
+        print(f"Running {corpus}/{mode}...", file=sys.stderr)
+        results.append(run_case(corpus_dir, args.scale, corpus, mode, kwargs, work_dir))
+
+    print_results(results)
+    if args.output:
+        report = {
+            "scale": args.scale,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
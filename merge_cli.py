@@ -0,0 +1,383 @@
+import os
+import sys
+import glob
+import json
+import argparse
+
+import merge_engine
+
+
+def read_manifest(path):
+    # A manifest is either a JSON list or a text file with one path per line.
+    # JSON entries can also be {"path": ..., "pages": "1,3-10"} objects.
+    # Returns a list of (path, pages or None).
+    with open(path, "r") as f:
+        text = f.read()
+
+    if path.lower().endswith(".json"):
+        entries = []
+        for entry in json.loads(text):
+            if isinstance(entry, dict):
+                entries.append((entry["path"], entry.get("pages")))
+            else:
+                entries.append((entry, None))
+    else:
+        lines = [line.strip() for line in text.splitlines()]
+        entries = [(line, None) for line in lines if line and not line.startswith("#")]
+
+    # Relative entries are resolved against the manifest's own folder
+    base_dir = os.path.dirname(os.path.abspath(path))
+    return [(entry if os.path.isabs(entry) else os.path.join(base_dir, entry), pages)
+            for entry, pages in entries]
+
+
+def expand_inputs(patterns, manifests=()):
+    # Returns the input files and a {path: pages} dict of per-file page selections
+    files = []
+    pages = {}
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        if matches:
+            files.extend(matches)
+        elif not glob.has_magic(pattern):
+            files.append(pattern)
+
+    for manifest in manifests:
+        for file_path, file_pages in read_manifest(manifest):
+            files.append(file_path)
+            if file_pages and file_path not in pages:
+                pages[file_path] = file_pages
+
+    # Keep the first occurrence, like the GUI does when files are re-selected
+    seen = set()
+    unique = []
+    for file_path in files:
+        if file_path not in seen:
+            seen.add(file_path)
+            unique.append(file_path)
+    return unique, pages
+
+
+def print_progress(text="Processing...", value=0):
+    print(f"[{value:3d}%] {text}", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m merge_cli",
+        description="Merge PDF or Excel files without the GUI")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    for mode, ext in (("pdf", ".pdf"), ("excel", ".xlsx")):
+        sub = subparsers.add_parser(mode, help=f"merge {mode} files into one {ext} file")
+        sub.add_argument("inputs", nargs="*", help="input files or glob patterns, merged in order")
+        if mode == "pdf":
+            sub.add_argument("-o", "--output", required=True, help="output .pdf path")
+        else:
+            sub.add_argument("-o", "--output", required=True,
+                             help="output path; .csv, .parquet and .feather write those formats, "
+                                  "anything else .xlsx")
+        sub.add_argument("-m", "--manifest", action="append", default=[],
+                         help="file listing inputs (one per line, or a JSON list); repeatable")
+        sub.add_argument("-q", "--quiet", action="store_true", help="do not print progress")
+        incremental_help = ("only append inputs added since the last run (tracked in "
+                            "OUTPUT.manifest.json); rebuilds if earlier inputs changed")
+        if mode == "excel":
+            incremental_help += (". An .xlsx output is still loaded and saved in full; "
+                                 "CSV outputs are appended to in place")
+        sub.add_argument("--incremental", action="store_true", help=incremental_help)
+        sub.add_argument("--metrics", metavar="FILE",
+                         help="append per-stage timings to FILE as JSON lines")
+        sub.add_argument("--profile", metavar="FILE",
+                         help="save cProfile stats for the run to FILE")
+        sub.add_argument("--trace-memory", action="store_true",
+                         help="record the largest Python allocation sites with tracemalloc "
+                              "(slows the merge down)")
+        if mode == "pdf":
+            sub.add_argument("--streaming", action="store_true",
+                             help="write pages out as they are read, keeping memory flat "
+                                  "for very large merges (outlines are not copied)")
+            sub.add_argument("--pages", metavar="SELECTION",
+                             help="pages to take from every input, in order, e.g. '1,3-10', "
+                                  "'end-1' (reversed) or '1-end@90' (rotated); JSON manifest "
+                                  "entries can set their own. Implies --streaming")
+            sub.add_argument("--optimize", action="store_true",
+                             help="write fonts, images and other objects that are identical across "
+                                  "inputs only once and compress uncompressed streams; reports the "
+                                  "bytes saved. Implies --streaming")
+            sub.add_argument("--read-ahead", type=int, default=2, metavar="N",
+                             help="inputs read in the background while the current one is "
+                                  "merged, hiding slow storage (default 2, 0 to turn off)")
+        else:
+            sub.add_argument("-j", "--workers", type=int, default=1,
+                             help="number of worker processes reading workbooks "
+                                  "(0 = one per CPU core, default 1)")
+            sub.add_argument("--streaming", action="store_true",
+                             help="write rows out as each workbook is read instead of "
+                                  "combining everything in memory; starts a new sheet "
+                                  "when Excel's row limit is reached")
+            sub.add_argument("--format", choices=("xlsx", "csv", "parquet", "feather"),
+                             help="output format when it shouldn't follow the output's extension "
+                                  "(parquet and feather need pyarrow)")
+            sub.add_argument("--sheets",
+                             help="sheets to merge: 'all' or a comma separated list of names "
+                                  "or 0-based indexes (default: first sheet only). A number is a "
+                                  "sheet name in workbooks that have a sheet called that; "
+                                  "workbooks lacking a listed sheet are merged without it")
+            sub.add_argument("--layout", choices=("stack", "separate"), default="stack",
+                             help="with --sheets, stack every sheet into one output sheet "
+                                  "(adding a Source_Sheet column) or keep one output sheet per "
+                                  "sheet name (default stack)")
+            sub.add_argument("--columns",
+                             help="comma separated column names to keep; other columns are "
+                                  "not loaded")
+            sub.add_argument("--rename", action="append", default=[], metavar="OLD=NEW",
+                             help="treat column OLD as NEW (headers already match ignoring case "
+                                  "and extra spaces); repeatable")
+            sub.add_argument("--dtype", action="append", default=[], metavar="COLUMN=TYPE",
+                             help="read COLUMN as TYPE (e.g. str, int64, float64); repeatable")
+            sub.add_argument("--cache", action="store_true",
+                             help="reuse parsed workbooks from the on-disk cache; "
+                                  "unchanged files are not parsed again")
+            add_cache_arguments(sub)
+
+    watch = subparsers.add_parser("watch", help="merge files as they arrive in a folder")
+    watch.add_argument("kind", choices=("pdf", "excel"), help="what to merge")
+    watch.add_argument("folder", help="folder to watch (not recursive)")
+    watch.add_argument("-o", "--output", required=True,
+                       help="output path per batch; may use strftime codes and {n} (the batch "
+                            "number), e.g. 'merged/scans-%%Y%%m%%d-%%H%%M%%S.pdf'")
+    watch.add_argument("--pattern", action="append", default=[],
+                       help="file name pattern to pick up (default *.pdf, or *.xlsx and *.xlsm); "
+                            "repeatable")
+    watch.add_argument("--settle", type=float, default=2.0,
+                       help="seconds a file's size and time must stay unchanged before it is "
+                            "taken (default 2)")
+    watch.add_argument("--debounce", type=float, default=5.0,
+                       help="seconds without new files before a batch is merged (default 5)")
+    watch.add_argument("--max-batch", type=int, default=500,
+                       help="merge as soon as this many files are ready (default 500)")
+    watch.add_argument("--queue-size", type=int, default=2,
+                       help="batches waiting for the merge worker before the watcher holds "
+                            "back (default 2)")
+    watch.add_argument("--move-to", metavar="FOLDER",
+                       help="move inputs to FOLDER once their batch is merged")
+    watch.add_argument("--polling", action="store_true",
+                       help="poll the folder instead of using inotify (for network shares)")
+    watch.add_argument("--poll-interval", type=float, default=2.0,
+                       help="seconds between polls (default 2)")
+    watch.add_argument("--streaming", action="store_true", help="as for the pdf and excel commands")
+    watch.add_argument("--optimize", action="store_true", help="PDF only: as for the pdf command")
+    watch.add_argument("-j", "--workers", type=int, default=1,
+                       help="Excel only: worker processes reading workbooks (default 1)")
+
+    jobs = subparsers.add_parser("jobs", help="run many merge jobs listed in a CSV or JSON file")
+    jobs.add_argument("jobs_file", help="job manifest (.json list of jobs, or .csv with one job per row)")
+    jobs.add_argument("-j", "--concurrency", type=int, default=0,
+                      help="jobs running at once (0 = one per CPU core, default 0)")
+    jobs.add_argument("--retries", type=int, default=1,
+                      help="times a failed job is tried again (default 1)")
+    jobs.add_argument("--report", metavar="FILE",
+                      help="write per-job status and a summary to FILE (.json or .csv)")
+    jobs.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+
+    cache = subparsers.add_parser("cache", help="inspect or clear the parsed-workbook cache")
+    cache.add_argument("action", choices=("info", "clear"))
+    add_cache_arguments(cache)
+
+    return parser
+
+
+def excel_options(args, parser):
+    try:
+        return merge_engine.parse_excel_options(args.sheets, args.layout, args.columns,
+                                                args.rename, args.dtype)
+    except ValueError as e:
+        parser.error(f"--{e}")
+
+
+def print_metrics(summary):
+    print(f"{'stage':<14} {'count':>6} {'seconds':>9} {'MB':>9}", file=sys.stderr)
+    for name, total in summary.items():
+        if name in ("alloc", "python_heap", "optimize"):
+            continue
+        print(f"{name:<14} {total['count']:>6} {total['seconds']:>9.3f} "
+              f"{total['bytes'] / (1024 * 1024):>9.1f}", file=sys.stderr)
+    if "optimize" in summary:
+        saved = summary["optimize"]
+        print(f"Optimized: {saved['bytes'] / (1024 * 1024):.1f} MB saved "
+              f"({saved['duplicate_objects']:,} duplicate objects, "
+              f"{saved['duplicate_bytes'] / (1024 * 1024):.1f} MB; "
+              f"{saved['compressed_streams']:,} streams compressed, "
+              f"{saved['compressed_bytes'] / (1024 * 1024):.1f} MB)", file=sys.stderr)
+    if "python_heap" in summary:
+        peak = summary["python_heap"]["bytes"]
+        print(f"Python heap peak: {peak / (1024 * 1024):.1f} MB", file=sys.stderr)
+
+
+def add_cache_arguments(parser):
+    parser.add_argument("--cache-dir", help="cache folder (implies --cache for merges)")
+    parser.add_argument("--cache-size", type=int, default=1024,
+                        help="maximum cache size in MB before the least recently used "
+                             "workbooks are evicted (default 1024)")
+
+
+def open_cache(args):
+    from workbook_cache import WorkbookCache
+    return WorkbookCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+
+def run_cache_command(args):
+    cache = open_cache(args)
+    if args.action == "clear":
+        cache.clear()
+        print(f"Cleared {cache.cache_dir}")
+        return 0
+
+    info = cache.info()
+    print(f"Folder:   {info['cache_dir']}")
+    print(f"Entries:  {info['entries']}")
+    print(f"Size:     {info['bytes'] / (1024 * 1024):.1f} MB of {info['max_bytes'] / (1024 * 1024):.0f} MB")
+    print(f"Tracked:  {info['known_paths']} files")
+    return 0
+
+
+def run_watch_command(args, parser):
+    from merge_watch import WatchDaemon
+
+    if not os.path.isdir(args.folder):
+        parser.error(f"not a folder: {args.folder}")
+    if args.kind == "pdf":
+        merge_kwargs = {"streaming": args.streaming, "optimize": args.optimize}
+    else:
+        if args.optimize:
+            parser.error("--optimize only applies to PDF merges")
+        merge_kwargs = {"streaming": args.streaming, "workers": args.workers}
+
+    daemon = WatchDaemon(args.folder, args.kind, args.output, patterns=args.pattern or None,
+                         debounce=args.debounce, settle=args.settle, max_batch=args.max_batch,
+                         queue_size=args.queue_size, move_to=args.move_to, polling=args.polling,
+                         poll_interval=args.poll_interval, merge_kwargs=merge_kwargs)
+    # A service manager stops the daemon with SIGTERM; finish like on Ctrl+C
+    import signal
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    daemon.run()
+    print(f"Stopped: {daemon.merged_batches} batches merged, {daemon.failed_batches} failed",
+          file=sys.stderr)
+    return 1 if daemon.failed_batches else 0
+
+
+def run_jobs_command(args, parser):
+    import time
+    from merge_jobs import read_jobs, run_jobs, summarize, write_report
+
+    try:
+        jobs = read_jobs(args.jobs_file)
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(f"cannot read {args.jobs_file}: {e}")
+    if not jobs:
+        parser.error(f"no jobs in {args.jobs_file}")
+
+    finished = []
+
+    def on_update(status):
+        if status["status"] in ("done", "failed"):
+            finished.append(status["name"])
+        if args.quiet:
+            return
+        if status["status"] == "running":
+            print(f"[{len(finished)}/{len(jobs)}] started {status['name']} "
+                  f"(attempt {status['attempts']})", file=sys.stderr)
+        elif status["status"] == "done":
+            print(f"[{len(finished)}/{len(jobs)}] done {status['name']}: {status['files']} files "
+                  f"in {status['seconds']:.1f}s", file=sys.stderr)
+        else:
+            will_retry = " (will retry)" if status["status"] == "pending" else ""
+            print(f"[{len(finished)}/{len(jobs)}] failed {status['name']}{will_retry}: "
+                  f"{status['error']}", file=sys.stderr)
+
+    start = time.perf_counter()
+    statuses = run_jobs(jobs, args.concurrency, args.retries, on_update)
+    summary = summarize(statuses, time.perf_counter() - start)
+    if args.report:
+        write_report(args.report, statuses, summary)
+
+    print(f"{summary['done']} of {summary['jobs']} jobs done, {summary['failed']} failed "
+          f"({summary['retried']} retried) in {summary['seconds']:.1f}s; "
+          f"{summary['job_seconds']:.1f}s of merge time", file=sys.stderr)
+    for status in statuses:
+        if status["status"] == "failed":
+            print(f"  {status['name']}: {status['error']}", file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.mode == "cache":
+        return run_cache_command(args)
+    if args.mode == "watch":
+        return run_watch_command(args, parser)
+    if args.mode == "jobs":
+        return run_jobs_command(args, parser)
+
+    files, pages = expand_inputs(args.inputs, args.manifest)
+    if not files:
+        parser.error("no input files given")
+
+    if args.mode == "pdf":
+        from page_spec import resolve_pages
+
+        # Per-file selections from manifests win over --pages
+        try:
+            pages = resolve_pages(files, pages, args.pages)
+        except ValueError as e:
+            parser.error(str(e))
+    elif pages:
+        parser.error("page selections only apply to PDF merges")
+
+    missing = [f for f in files if not os.path.isfile(f)]
+    if missing:
+        parser.error("input file not found: " + ", ".join(missing))
+
+    from merge_metrics import MergeMetrics, JsonLinesSink, profile_run
+
+    sink = JsonLinesSink(args.metrics) if args.metrics else None
+    metrics = MergeMetrics(sink, mode=args.mode)
+    progress = None if args.quiet else print_progress
+    try:
+        with profile_run(args.profile, args.trace_memory, metrics):
+            if args.mode == "pdf":
+                count = merge_engine.merge_pdfs(files, args.output, progress, streaming=args.streaming,
+                                                incremental=args.incremental, metrics=metrics,
+                                                pages=pages or None, optimize=args.optimize,
+                                                read_ahead=args.read_ahead)
+            else:
+                cache = open_cache(args) if args.cache or args.cache_dir else None
+                count = merge_engine.merge_excels(files, args.output, progress, workers=args.workers,
+                                                  streaming=args.streaming, cache=cache,
+                                                  incremental=args.incremental,
+                                                  options=excel_options(args, parser),
+                                                  metrics=metrics, output_format=args.format)
+                if cache is not None and not args.quiet:
+                    print(f"Cache: {cache.hits} hits, {cache.misses} misses", file=sys.stderr)
+    except Exception as e:
+        print(f"Failed to merge files: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if sink is not None:
+            sink.close()
+
+    if not args.quiet:
+        print(f"Merged {count} {args.mode.upper()} files into {args.output}", file=sys.stderr)
+        if args.streaming:
+            rss = merge_engine.peak_rss()
+            if rss is not None:
+                print(f"Peak memory: {rss / (1024 * 1024):.1f} MB", file=sys.stderr)
+        print_metrics(metrics.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,814 @@
+import os
+import io
+import time
+
+from merge_metrics import NULL_METRICS
+from excel_schema import header_key, clean_header, merge_headers, align_columns
+
+
+class MergeCancelled(Exception):
+    pass
+
+
+def _no_progress(text="Processing...", value=0):
+    pass
+
+
+def _check_cancel(cancel):
+    if cancel is not None and cancel.is_set():
+        raise MergeCancelled("Merge cancelled")
+
+
+def _file_sizes(files):
+    sizes = [os.path.getsize(f) for f in files]
+    # Guard against a set of empty files so progress never divides by zero
+    return sizes, sum(sizes) or 1
+
+
+def _worker_count(workers, files):
+    # 0 or None means one per CPU core; never more than there are files
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    return min(workers, len(files))
+
+
+def peak_rss():
+    # Peak resident set size of this process in bytes, or None if unavailable.
+    # Linux's VmHWM starts fresh in every new program, while ru_maxrss carries
+    # over the parent's peak through fork + exec, so prefer the former.
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def preload(modes=("pdf", "excel")):
+    # Imports the libraries each merge mode needs, e.g. on a background thread
+    # once the GUI is up, so the first merge doesn't wait on them
+    for mode in modes:
+        try:
+            if mode == "pdf":
+                import PyPDF2
+            else:
+                import pandas
+                import openpyxl
+        except ImportError:
+            # Reported properly when a merge actually needs it
+            pass
+
+
+def _merge_incremental(mode, files, output_path, progress, rebuild, append, options=None,
+                       file_options=None):
+    # Appends only the inputs added since the last run, as recorded in the
+    # output's sidecar manifest. append returns False when the output can't
+    # take an in-place append, in which case it is rebuilt from scratch.
+    from merge_manifest import plan_append, save_manifest
+
+    progress("Checking previous output...", 0)
+    new_files, fingerprints = plan_append(mode, files, output_path, options, file_options)
+
+    if new_files is None:
+        rebuild()
+    elif not new_files:
+        progress("Output already up to date", 100)
+    elif not append(new_files):
+        rebuild()
+
+    save_manifest(output_path, mode, fingerprints, options)
+    return len(files)
+
+
+def merge_pdfs(files, output_path, progress=None, cancel=None, streaming=False, incremental=False,
+               metrics=None, pages=None, optimize=False, read_ahead=None):
+    # pages selects, reorders and rotates pages (see page_spec), either one
+    # selection for every file or a {path: selection} dict; files missing
+    # from the dict are merged whole. optimize shares identical objects
+    # between inputs and compresses uncompressed streams; the bytes saved are
+    # recorded in metrics as the "optimize" stage. read_ahead is how many
+    # inputs are read in the background while the current one is parsed
+    # (default 2, 0 to read each file only when it is reached).
+    from pdf_prefetch import DEFAULT_READ_AHEAD
+
+    progress = progress or _no_progress
+    metrics = metrics or NULL_METRICS
+    if read_ahead is None:
+        read_ahead = DEFAULT_READ_AHEAD
+    with metrics.stage("total", nbytes=sum(_file_sizes(files)[0])):
+        return _merge_pdfs(files, output_path, progress, cancel, streaming, incremental, metrics, pages,
+                           optimize, read_ahead)
+
+
+def _merge_pdfs(files, output_path, progress, cancel, streaming, incremental, metrics, pages,
+                optimize, read_ahead):
+    if incremental:
+        return _merge_incremental(
+            "pdf", files, output_path, progress,
+            rebuild=lambda: _merge_pdfs(files, output_path, progress, cancel, streaming, False,
+                                        metrics, pages, optimize, read_ahead),
+            append=lambda new_files: _append_pdfs(new_files, output_path, progress, cancel, metrics,
+                                                  pages, optimize, read_ahead),
+            options={"pages": pages} if isinstance(pages, str) else None,
+            file_options=pages if isinstance(pages, dict) else None)
+
+    # PdfMerger can't reorder, rotate or share objects between inputs, and the
+    # streaming writer only ever copies the objects the selected pages use
+    if streaming or pages or optimize:
+        return _stream_merge_pdfs(files, output_path, progress, cancel, metrics, pages, optimize,
+                                  read_ahead)
+
+    # PyPDF2 is only needed for this mode, so import it here
+    from PyPDF2 import PdfMerger
+    from pdf_prefetch import prefetch_inputs
+
+    total_files = len(files)
+    sizes, total_bytes = _file_sizes(files)
+    size_of = dict(zip(files, sizes))
+    done_bytes = 0
+    merger = PdfMerger()
+
+    try:
+        # Reading (on the prefetch threads) and parsing are timed apart to
+        # tell slow storage from slow files
+        with prefetch_inputs(files, read_ahead, metrics=metrics) as prefetched:
+            for pdf_path, data in prefetched:
+                # PdfMerger copies each input into its own buffer, so the
+                # prefetched one (and its mapping) can go as soon as it's added
+                try:
+                    _check_cancel(cancel)
+                    progress(f"Processing {os.path.basename(pdf_path)}...",
+                             int((done_bytes / total_bytes) * 90))
+                    with metrics.stage("parse", pdf_path, size_of[pdf_path]):
+                        merger.append(data)
+                finally:
+                    data.close()
+                done_bytes += size_of[pdf_path]
+
+        _check_cancel(cancel)
+        progress("Saving merged PDF...", 95)
+        with metrics.stage("write", output_path) as stage:
+            merger.write(output_path)
+            stage["bytes"] = os.path.getsize(output_path)
+    finally:
+        merger.close()
+
+    progress("Complete!", 100)
+    return total_files
+
+
+def _record_optimize(metrics, report):
+    counts = {key: report[key] for key in ("duplicate_objects", "duplicate_bytes",
+                                           "compressed_streams", "compressed_bytes")}
+    metrics.record("optimize", 0.0, nbytes=report["saved_bytes"], **counts)
+
+
+def _pdf_file_progress(files, progress, cancel, verb):
+    # on_file callback for pdf_stream: checks for cancel and reports progress
+    # by bytes before each input is copied
+    sizes, total_bytes = _file_sizes(files)
+    size_of = dict(zip(files, sizes))
+    done = {"bytes": 0}
+
+    def on_file(pdf_path):
+        _check_cancel(cancel)
+        progress(f"{verb} {os.path.basename(pdf_path)}...", int((done["bytes"] / total_bytes) * 95))
+        done["bytes"] += size_of[pdf_path]
+
+    return on_file
+
+
+def _stream_merge_pdfs(files, output_path, progress, cancel, metrics, pages=None, optimize=False,
+                       read_ahead=2):
+    # Pages are written out as each input is read, so memory is bounded by the
+    # largest single input instead of the whole merge. Outlines are not copied.
+    from pdf_stream import stream_merge_pdfs
+
+    on_file = _pdf_file_progress(files, progress, cancel, "Processing")
+    try:
+        report = stream_merge_pdfs(files, output_path, on_file, metrics, pages, optimize, read_ahead)
+    except BaseException:
+        # Don't leave a truncated PDF behind
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+    if optimize:
+        _record_optimize(metrics, report)
+    progress("Complete!", 100)
+    return len(files)
+
+
+def _append_pdfs(files, output_path, progress, cancel, metrics, pages=None, optimize=False,
+                 read_ahead=2):
+    # Adds the pages as a PDF incremental update after the existing bytes
+    from pdf_stream import append_pdfs, read_update_info
+
+    if read_update_info(output_path) is None:
+        return False
+
+    on_file = _pdf_file_progress(files, progress, cancel, "Appending")
+    original = os.stat(output_path)
+    try:
+        report = append_pdfs(output_path, files, on_file, metrics, pages, optimize, read_ahead)
+    except BaseException:
+        # Cut off the partial update so the previous output stays valid
+        _restore_output(output_path, original)
+        raise
+
+    if optimize:
+        _record_optimize(metrics, report)
+    progress("Complete!", 100)
+    return True
+
+
+def _restore_output(output_path, original):
+    # Cuts a failed in-place append back off. The timestamps go back too: the
+    # sidecar manifest recorded them, and a new mtime would make the next
+    # incremental run take the output for edited and rebuild it.
+    with open(output_path, "r+b") as f:
+        f.truncate(original.st_size)
+    os.utime(output_path, ns=(original.st_atime_ns, original.st_mtime_ns))
+
+
+def _excel_read_kwargs(options):
+    # options: sheets (None = first sheet, "all", or a list of names/indexes),
+    # layout ("stack" or "separate"), usecols (column names) and dtype
+    sheets = options.get("sheets")
+    if sheets is None:
+        sheet_name = 0
+    elif sheets == "all":
+        sheet_name = None
+    else:
+        sheet_name = list(sheets)
+
+    kwargs = {"sheet_name": sheet_name}
+    if options.get("usecols"):
+        # A callable tolerates sheets that lack some of the columns. Columns
+        # match like headers do across files, before or after renaming.
+        wanted = {header_key(column) for column in options["usecols"]}
+        rename = options.get("rename")
+        kwargs["usecols"] = lambda column: (header_key(column) in wanted or
+                                            header_key(clean_header(column, rename)) in wanted)
+    if options.get("dtype"):
+        # Columns spelled exactly like this are converted while parsing; the
+        # rest are matched like headers in _apply_dtypes
+        kwargs["dtype"] = dict(options["dtype"])
+    return kwargs
+
+
+def _cell_text(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _apply_dtypes(df, options):
+    # Casts the columns that match a dtype key ignoring case and extra
+    # spaces, or after renaming, but weren't spelled like it in the file
+    dtype = options.get("dtype")
+    if not dtype:
+        return df
+    wanted = {header_key(column): type_name for column, type_name in dtype.items()}
+    rename = options.get("rename")
+    casts = {}
+    for column in df.columns:
+        if column in dtype:
+            continue
+        type_name = wanted.get(header_key(column), wanted.get(header_key(clean_header(column, rename))))
+        if type_name is not None:
+            casts[column] = type_name
+    if not casts:
+        return df
+    df = df.copy(deep=False)
+    for column, type_name in casts.items():
+        if type_name in (str, "str"):
+            # Like dtype=str while parsing: blanks stay blank, and whole
+            # numbers (read as float when the column has blanks) lose the .0
+            df[column] = df[column].map(_cell_text, na_action="ignore")
+        else:
+            df[column] = df[column].astype(type_name)
+    return df
+
+
+def _read_excel(excel_path, options=None, nrows=None, timings=None):
+    # Module level so it can be sent to worker processes. Returns a dict of
+    # sheet name -> frame holding only the requested sheets and columns. The
+    # file is read in one go before parsing so the two can be timed apart.
+    import pandas as pd
+
+    options = options or {}
+    kwargs = _excel_read_kwargs(options)
+    if nrows is not None:
+        kwargs["nrows"] = nrows
+
+    start = time.perf_counter()
+    with open(excel_path, "rb") as f:
+        data = io.BytesIO(f.read())
+    read_done = time.perf_counter()
+    try:
+        with pd.ExcelFile(data) as book:
+            if isinstance(kwargs["sheet_name"], list):
+                kwargs["sheet_name"] = _select_sheets(kwargs["sheet_name"], book.sheet_names)
+            sheets = pd.read_excel(book, **kwargs) if kwargs["sheet_name"] != [] else {}
+    except Exception as e:
+        raise ValueError(f"{os.path.basename(excel_path)}: {e}") from e
+    if timings is not None:
+        timings["read"] = read_done - start
+        timings["parse"] = time.perf_counter() - read_done
+        timings["bytes"] = len(data.getbuffer())
+    if not isinstance(sheets, dict):
+        sheets = {kwargs["sheet_name"]: sheets}
+
+    if options.get("dtype"):
+        sheets = {name: _apply_dtypes(df, options) for name, df in sheets.items()}
+
+    usecols = options.get("usecols")
+    if usecols:
+        order = {header_key(column): i for i, column in enumerate(usecols)}
+        rename = options.get("rename")
+
+        def position(column):
+            return order.get(header_key(column), order.get(header_key(clean_header(column, rename))))
+
+        sheets = {name: df[sorted(df.columns, key=position)] for name, df in sheets.items()}
+    return sheets
+
+
+def _select_sheets(wanted, sheet_names):
+    # Like missing columns, selected sheets a workbook lacks are skipped. A
+    # number is a sheet name when the workbook has a sheet called that, and a
+    # 0-based index otherwise.
+    selected = []
+    for sheet in wanted:
+        if isinstance(sheet, int) and str(sheet) in sheet_names:
+            sheet = str(sheet)
+        elif isinstance(sheet, int) and sheet >= len(sheet_names):
+            continue
+        elif not isinstance(sheet, int) and sheet not in sheet_names:
+            continue
+        if sheet not in selected:
+            selected.append(sheet)
+    return selected
+
+
+def _read_excel_timed(excel_path, options=None):
+    timings = {}
+    sheets = _read_excel(excel_path, options, timings=timings)
+    return sheets, timings
+
+
+def _source_names(files):
+    names = []
+    for excel_path in files:
+        name = os.path.basename(excel_path)
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def _tag_frames(sheets, excel_path, options, sources=None):
+    # Turns the sheets read from one file into output sheet -> frame, where
+    # None is the single default output sheet. Headers are cleaned up (see
+    # excel_schema) and Source_File is a categorical over sources, the names
+    # of all files in the merge, so frames concatenate without turning it
+    # into one Python string per row.
+    import numpy as np
+    import pandas as pd
+
+    options = options or {}
+    source = os.path.basename(excel_path)
+    sources = sources or [source]
+    rename = options.get("rename")
+
+    def tag(df, **columns):
+        df = df.set_axis([clean_header(column, rename) for column in df.columns], axis=1)
+        codes = np.full(len(df), sources.index(source), dtype=np.int32)
+        # assign() builds one new frame, where inserting into a wide frame
+        # would fragment it
+        return df.assign(Source_File=pd.Categorical.from_codes(codes, categories=sources), **columns)
+
+    if options.get("sheets") is None:
+        df = next(iter(sheets.values()))
+        return {None: tag(df)}
+
+    if options.get("layout") == "separate":
+        return {str(sheet_name): tag(df) for sheet_name, df in sheets.items()}
+
+    parts = [tag(df, Source_Sheet=str(sheet_name)) for sheet_name, df in sheets.items()]
+    return {None: pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()}
+
+
+def _excel_columns(excel_path, options, cache=None):
+    # Output columns per output sheet, from the headers the cache recorded
+    # for this file or else from the header rows only
+    headers = None
+    if cache is not None:
+        headers = cache.headers(cache.key_for(excel_path, _options_key(options)))
+    if headers is not None:
+        import pandas as pd
+        sheets = {name: pd.DataFrame(columns=columns) for name, columns in headers.items()}
+    else:
+        sheets = _read_excel(excel_path, options, nrows=0)
+    frames = _tag_frames(sheets, excel_path, options)
+    return {name: list(df.columns) for name, df in frames.items()}
+
+
+def _options_key(options):
+    # Only the options that change what is parsed; layout is applied afterwards.
+    # rename decides which columns usecols and dtype match, otherwise it is
+    # applied afterwards too.
+    import json
+
+    read_options = {k: v for k, v in (options or {}).items() if k in ("sheets", "usecols", "dtype")}
+    if options and options.get("rename") and (options.get("usecols") or options.get("dtype")):
+        read_options["rename"] = options["rename"]
+    return json.dumps(read_options, sort_keys=True, default=str) if read_options else ""
+
+
+def _iter_excel_frames(files, workers, cancel, cache=None, options=None, metrics=NULL_METRICS):
+    # Yields (index, {output sheet: frame}) in input order. With workers > 1
+    # the reads run on a process pool, keeping at most two reads per worker in
+    # flight so finished frames never pile up faster than the caller consumes
+    # them. Cache lookups and stores stay in this process so the index has a
+    # single writer.
+    variant = _options_key(options)
+    sources = _source_names(files)
+
+    def lookup(excel_path):
+        if cache is None:
+            return None, None
+        with metrics.stage("cache_lookup", excel_path):
+            key = cache.key_for(excel_path, variant)
+            return key, cache.get(key)
+
+    def finish(key, sheets, timings, excel_path):
+        # Parse timings come back from wherever the read ran
+        if timings is not None:
+            metrics.record("read", timings["read"], file=excel_path, nbytes=timings["bytes"])
+            metrics.record("parse", timings["parse"], file=excel_path, nbytes=timings["bytes"])
+            if key is not None:
+                with metrics.stage("cache_store", excel_path):
+                    cache.put(key, sheets)
+        with metrics.stage("tag", excel_path):
+            return _tag_frames(sheets, excel_path, options, sources)
+
+    try:
+        if workers <= 1:
+            for i, excel_path in enumerate(files):
+                _check_cancel(cancel)
+                key, sheets = lookup(excel_path)
+                timings = None
+                if sheets is None:
+                    sheets, timings = _read_excel_timed(excel_path, options)
+                yield i, finish(key, sheets, timings, excel_path)
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        window = workers * 2
+        executor = ProcessPoolExecutor(max_workers=workers)
+        slots = []
+        try:
+            next_index = 0
+            for i in range(len(files)):
+                while next_index < len(files) and next_index < i + window:
+                    key, sheets = lookup(files[next_index])
+                    future = None
+                    if sheets is None:
+                        future = executor.submit(_read_excel_timed, files[next_index], options)
+                    slots.append((key, sheets, future))
+                    next_index += 1
+
+                _check_cancel(cancel)
+                key, sheets, future = slots[i]
+                timings = None
+                if sheets is None:
+                    with metrics.stage("wait", files[i]):
+                        sheets, timings = future.result()
+                # Let the frames be freed once the caller is done with them
+                slots[i] = None
+                yield i, finish(key, sheets, timings, files[i])
+        finally:
+            # Drop queued reads on cancel or error (shutdown's cancel_futures needs 3.9)
+            for slot in slots:
+                if slot is not None and slot[2] is not None:
+                    slot[2].cancel()
+            executor.shutdown(wait=True)
+    finally:
+        if cache is not None:
+            cache.save_index()
+
+
+def parse_excel_options(sheets=None, layout=None, columns=None, rename=(), dtype=()):
+    # merge_excels options from their command-line spellings: sheets "all" or
+    # names and 0-based indexes separated by commas (numbers are matched
+    # against sheet names first when reading), columns separated by
+    # commas, rename items "OLD=NEW" and dtype items "COLUMN=TYPE". Raises
+    # ValueError for malformed items; None when nothing is set.
+    options = {}
+    if sheets:
+        if sheets == "all":
+            options["sheets"] = "all"
+        else:
+            names = [name.strip() for name in sheets.split(",") if name.strip()]
+            options["sheets"] = [int(name) if name.isdigit() else name for name in names]
+        options["layout"] = layout or "stack"
+    if columns:
+        options["usecols"] = [name.strip() for name in columns.split(",") if name.strip()]
+    if rename:
+        options["rename"] = {}
+        for item in rename:
+            old, sep, new = item.partition("=")
+            if not sep or not old.strip() or not new.strip():
+                raise ValueError(f"rename expects OLD=NEW, got {item!r}")
+            options["rename"][old.strip()] = new.strip()
+    if dtype:
+        options["dtype"] = {}
+        for item in dtype:
+            column, sep, type_name = item.partition("=")
+            if not sep or not column.strip() or not type_name.strip():
+                raise ValueError(f"dtype expects COLUMN=TYPE, got {item!r}")
+            options["dtype"][column.strip()] = type_name.strip()
+    return options or None
+
+
+def merge_excels(files, output_path, progress=None, cancel=None, workers=1, streaming=False,
+                 cache=None, incremental=False, options=None, metrics=None, output_format=None):
+    # output_format is "xlsx", "csv", "parquet" or "feather"; by default it
+    # follows the output's extension
+    from table_stream import output_format as resolve_format
+
+    progress = progress or _no_progress
+    metrics = metrics or NULL_METRICS
+    fmt = resolve_format(output_path, output_format)
+    with metrics.stage("total", nbytes=sum(_file_sizes(files)[0])):
+        return _merge_excels(files, output_path, progress, cancel, workers, streaming, cache,
+                             incremental, options, metrics, fmt)
+
+
+def _merge_excels(files, output_path, progress, cancel, workers, streaming, cache, incremental,
+                  options, metrics, fmt):
+    if incremental:
+        # A different format for the same output path must not append to it
+        manifest_options = options if fmt == "xlsx" else dict(options or {}, format=fmt)
+        return _merge_incremental(
+            "excel", files, output_path, progress,
+            rebuild=lambda: _merge_excels(files, output_path, progress, cancel, workers, streaming,
+                                          cache, False, options, metrics, fmt),
+            append=lambda new_files: _append_excels(new_files, output_path, progress, cancel,
+                                                    workers, cache, options, metrics, fmt),
+            options=manifest_options)
+
+    total_files = len(files)
+    sizes, total_bytes = _file_sizes(files)
+
+    workers = _worker_count(workers, files)
+
+    if workers > 1:
+        progress(f"Reading {total_files} files with {workers} workers...", 0)
+    frames = _iter_excel_frames(files, workers, cancel, cache, options, metrics)
+
+    if fmt != "xlsx":
+        # Table formats are always written file by file
+        _stream_write_table(fmt, files, output_path, frames, sizes, total_bytes, progress, cancel,
+                            options, metrics, cache)
+        progress("Complete!", 100)
+        return total_files
+
+    if streaming:
+        _stream_write_excels(files, output_path, frames, sizes, total_bytes, progress, cancel, options,
+                             metrics, cache)
+        progress("Complete!", 100)
+        return total_files
+
+    import pandas as pd
+    from excel_stream import sheet_title
+    from excel_schema import unify_frames
+
+    done_bytes = 0
+    all_data = {}
+    for i, tagged in frames:
+        progress(f"Read {os.path.basename(files[i])}", int((done_bytes / total_bytes) * 80))
+        for name, df in tagged.items():
+            all_data.setdefault(name, []).append(df)
+        done_bytes += sizes[i]
+
+    _check_cancel(cancel)
+    progress("Combining data...", 90)
+    combined = {}
+    for name, parts in all_data.items():
+        with metrics.stage("schema"):
+            parts = unify_frames(parts)
+        with metrics.stage("concat"):
+            df = pd.concat(parts, ignore_index=True)
+            del parts
+            if "Source_Sheet" in df.columns:
+                df["Source_Sheet"] = df["Source_Sheet"].astype("category")
+        combined[name] = df
+    all_data.clear()
+
+    _check_cancel(cancel)
+    progress("Saving merged Excel file...", 95)
+    with metrics.stage("write", output_path) as stage:
+        if list(combined) == [None]:
+            combined[None].to_excel(output_path, index=False)
+        else:
+            with pd.ExcelWriter(output_path) as excel_writer:
+                for name, df in combined.items():
+                    df.to_excel(excel_writer, sheet_name=sheet_title(name or "Sheet1"), index=False)
+        stage["bytes"] = os.path.getsize(output_path)
+
+    progress("Complete!", 100)
+    return total_files
+
+
+def _collect_columns(files, options, cancel, cache=None):
+    # Union of the output columns per output sheet, in first-seen order, with
+    # headers matched as in excel_schema. Only files the cache doesn't hold
+    # are opened.
+    columns = {}
+    for excel_path in files:
+        _check_cancel(cancel)
+        for name, file_columns in _excel_columns(excel_path, options, cache).items():
+            columns[name] = merge_headers([columns.get(name, []), file_columns])[0]
+    return columns
+
+
+def _stream_write_excels(files, output_path, frames, sizes, total_bytes, progress, cancel, options,
+                         metrics, cache=None):
+    # Each source's rows go straight into a write-only workbook, so only one
+    # file's frames are held at a time instead of every frame plus their concat
+    from openpyxl import Workbook
+    from excel_stream import StreamingExcelWriter
+
+    progress("Reading column headers...", 0)
+    with metrics.stage("header_scan"):
+        columns = _collect_columns(files, options, cancel, cache)
+
+    workbook = Workbook(write_only=True)
+    writers = {name: StreamingExcelWriter(sheet_columns, workbook=workbook, title=name)
+               for name, sheet_columns in columns.items()}
+    canonical = {name: merge_headers([sheet_columns])[1] for name, sheet_columns in columns.items()}
+
+    done_bytes = 0
+    for i, tagged in frames:
+        progress(f"Writing {os.path.basename(files[i])}...", int((done_bytes / total_bytes) * 90))
+        with metrics.stage("serialize", files[i]):
+            for name, df in tagged.items():
+                writers[name].append_frame(align_columns(df, canonical[name]))
+        done_bytes += sizes[i]
+
+    _check_cancel(cancel)
+    progress("Saving merged Excel file...", 95)
+    with metrics.stage("write", output_path) as stage:
+        for writer in writers.values():
+            writer.ensure_sheet()
+        workbook.save(output_path)
+        stage["bytes"] = os.path.getsize(output_path)
+
+
+def _stream_write_table(fmt, files, output_path, frames, sizes, total_bytes, progress, cancel,
+                        options, metrics, cache=None):
+    # CSV, Parquet and Feather hold a single table, written one source at a time
+    from table_stream import open_table_writer
+
+    progress("Reading column headers...", 0)
+    with metrics.stage("header_scan"):
+        columns = _collect_columns(files, options, cancel, cache)
+    if list(columns) != [None]:
+        raise ValueError(f"One output sheet per sheet name needs .xlsx output, not {fmt}")
+
+    writer = open_table_writer(fmt, output_path, columns[None])
+    canonical = merge_headers([columns[None]])[1]
+    try:
+        done_bytes = 0
+        for i, tagged in frames:
+            progress(f"Writing {os.path.basename(files[i])}...", int((done_bytes / total_bytes) * 95))
+            with metrics.stage("serialize", files[i]):
+                try:
+                    writer.append_frame(align_columns(tagged[None], canonical))
+                except ValueError as e:
+                    raise ValueError(f"{os.path.basename(files[i])}: {e}") from e
+            done_bytes += sizes[i]
+        _check_cancel(cancel)
+    except BaseException:
+        # Don't leave a truncated file behind on cancel or error
+        writer.close()
+        os.remove(output_path)
+        raise
+
+    progress("Saving merged file...", 95)
+    with metrics.stage("write", output_path) as stage:
+        writer.close()
+        stage["bytes"] = os.path.getsize(output_path)
+
+
+def _append_columns(files, options, cancel, cache, metrics):
+    # The new files' output columns, or None when they don't all go to the
+    # single output sheet an in-place append can extend
+    with metrics.stage("header_scan"):
+        columns = _collect_columns(files, options, cancel, cache)
+    return columns[None] if list(columns) == [None] else None
+
+
+def _header_canonical(columns, header):
+    # An existing output's header is text; returns its canonical spellings
+    # when it has every one of columns, None when new columns force a rebuild
+    existing = {header_key(column) for column in header}
+    if any(header_key(str(column)) not in existing for column in columns):
+        return None
+    return merge_headers([header])[1]
+
+
+def _align_to_header(df, canonical):
+    # Columns are matched by their header text
+    df = df.set_axis([str(column) for column in df.columns], axis=1)
+    return align_columns(df, canonical)
+
+
+def _append_excels(files, output_path, progress, cancel, workers, cache, options, metrics, fmt):
+    # Adds the new workbooks' rows after the existing output's last row. New
+    # columns can't be added to a header that is already written, and
+    # sheet-per-source layouts can't be extended in place, so those force a
+    # rebuild. Parquet and Feather files can't be extended either.
+    if fmt in ("parquet", "feather"):
+        return False
+    if fmt == "csv":
+        return _append_csv(files, output_path, progress, cancel, workers, cache, options, metrics)
+
+    from excel_stream import StreamingExcelWriter
+
+    progress("Opening existing output...", 0)
+    columns = _append_columns(files, options, cancel, cache, metrics)
+    if columns is None:
+        return False
+    with metrics.stage("open_output", output_path, os.path.getsize(output_path)):
+        writer = StreamingExcelWriter.append_to(output_path)
+    canonical = _header_canonical(columns, writer.columns)
+    if canonical is None:
+        return False
+
+    sizes, total_bytes = _file_sizes(files)
+    workers = _worker_count(workers, files)
+    done_bytes = 0
+    for i, tagged in _iter_excel_frames(files, workers, cancel, cache, options, metrics):
+        progress(f"Appending {os.path.basename(files[i])}...", int((done_bytes / total_bytes) * 90))
+        with metrics.stage("serialize", files[i]):
+            writer.append_frame(_align_to_header(tagged[None], canonical))
+        done_bytes += sizes[i]
+
+    _check_cancel(cancel)
+    progress("Saving merged Excel file...", 95)
+    # Save beside the output first so a failed save never damages it
+    tmp_path = output_path + ".tmp.xlsx"
+    with metrics.stage("write", output_path) as stage:
+        writer.save(tmp_path)
+        os.replace(tmp_path, output_path)
+        stage["bytes"] = os.path.getsize(output_path)
+
+    progress("Complete!", 100)
+    return True
+
+
+def _append_csv(files, output_path, progress, cancel, workers, cache, options, metrics):
+    # Rows are appended in place; a failed append is cut back off
+    from table_stream import CsvStreamWriter, read_csv_header
+
+    progress("Opening existing output...", 0)
+    columns = _append_columns(files, options, cancel, cache, metrics)
+    if columns is None:
+        return False
+    header = read_csv_header(output_path)
+    canonical = _header_canonical(columns, header)
+    if canonical is None:
+        return False
+
+    sizes, total_bytes = _file_sizes(files)
+    workers = _worker_count(workers, files)
+    original = os.stat(output_path)
+    writer = CsvStreamWriter(output_path, header, append=True)
+    try:
+        done_bytes = 0
+        for i, tagged in _iter_excel_frames(files, workers, cancel, cache, options, metrics):
+            progress(f"Appending {os.path.basename(files[i])}...", int((done_bytes / total_bytes) * 95))
+            with metrics.stage("serialize", files[i]):
+                writer.append_frame(_align_to_header(tagged[None], canonical))
+            done_bytes += sizes[i]
+        writer.close()
+    except BaseException:
+        writer.close()
+        _restore_output(output_path, original)
+        raise
+
+    progress("Complete!", 100)
+    return True
@@ -0,0 +1,243 @@
+import os
+import csv
+import glob
+import json
+import time
+from collections import deque
+
+import merge_engine
+
+# A job manifest lists many independent merges. JSON is a list of objects:
+#   {"name": "acme", "mode": "pdf", "output": "out/acme.pdf",
+#    "inputs": ["cover.pdf", "acme/*.pdf", {"path": "terms.pdf", "pages": "1-2"}],
+#    "streaming": true, "optimize": true}
+# Excel jobs can also set "format", "incremental" and "options" (sheets,
+# usecols, rename, dtype, layout, as for merge_excels). A CSV manifest has
+# one row per job with the columns name, mode, output and inputs (separated
+# by ";"), plus optional pages, streaming, optimize, incremental, format,
+# sheets, layout, columns, rename and dtype, spelled as for merge_cli (with
+# rename and dtype items separated by ";"). Relative paths are resolved
+# against the manifest's folder.
+
+JOB_FLAGS = ("streaming", "optimize", "incremental")
+
+
+def read_jobs(path):
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = [_csv_job(row, i) for i, row in enumerate(csv.DictReader(f))]
+    if not isinstance(entries, list):
+        raise ValueError(f"{path}: expected a list of jobs")
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = [_normalize_job(entry, i, base_dir) for i, entry in enumerate(entries)]
+
+    # Two jobs writing one output would overwrite each other mid-merge
+    outputs = {}
+    for job in jobs:
+        key = os.path.normcase(os.path.abspath(job["output"]))
+        if key in outputs:
+            raise ValueError(f"Jobs {outputs[key]!r} and {job['name']!r} both write {job['output']}")
+        outputs[key] = job["name"]
+
+    names = [job["name"] for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate job names: {', '.join(duplicates)}")
+    return jobs
+
+
+def _csv_job(row, index):
+    row = {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+    entry = {key: row[key] for key in ("name", "mode", "output", "pages", "format") if row.get(key)}
+    entry["inputs"] = [item.strip() for item in row.get("inputs", "").split(";") if item.strip()]
+    for flag in JOB_FLAGS:
+        if row.get(flag):
+            entry[flag] = row[flag].lower() in ("1", "true", "yes", "y")
+    # Same spellings as merge_cli's options; rename and dtype items are
+    # separated by ";" like inputs
+    try:
+        options = merge_engine.parse_excel_options(
+            row.get("sheets"), row.get("layout"), row.get("columns"),
+            [item for item in row.get("rename", "").split(";") if item.strip()],
+            [item for item in row.get("dtype", "").split(";") if item.strip()])
+    except ValueError as e:
+        raise ValueError(f"Job {entry.get('name') or f'job-{index + 1}'!r}: {e}")
+    if options:
+        entry["options"] = options
+    return entry
+
+
+def _normalize_job(entry, index, base_dir):
+    if not isinstance(entry, dict):
+        raise ValueError(f"Job {index + 1}: expected an object, got {entry!r}")
+    name = str(entry.get("name") or f"job-{index + 1}")
+    mode = entry.get("mode")
+    if mode not in ("pdf", "excel"):
+        raise ValueError(f"Job {name!r}: mode must be 'pdf' or 'excel', got {mode!r}")
+    if not entry.get("output"):
+        raise ValueError(f"Job {name!r}: no output given")
+
+    def resolve(path):
+        return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+    files = []
+    pages = {}
+    for item in entry.get("inputs") or []:
+        item_pages = None
+        if isinstance(item, dict):
+            item, item_pages = item["path"], item.get("pages")
+        pattern = resolve(item)
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for file_path in matches:
+            if file_path not in files:
+                files.append(file_path)
+                if item_pages:
+                    pages[file_path] = item_pages
+    if not files:
+        raise ValueError(f"Job {name!r}: no input files")
+
+    kwargs = {flag: bool(entry[flag]) for flag in JOB_FLAGS if flag in entry}
+    if mode == "pdf":
+        from page_spec import resolve_pages
+
+        # Per-input selections win over the job's
+        try:
+            pages = resolve_pages(files, pages, entry.get("pages"))
+        except ValueError as e:
+            raise ValueError(f"Job {name!r}: {e}")
+        if pages:
+            kwargs["pages"] = pages
+    else:
+        kwargs.pop("optimize", None)
+        if pages:
+            raise ValueError(f"Job {name!r}: page selections only apply to PDF merges")
+        if entry.get("format"):
+            kwargs["output_format"] = entry["format"]
+        if entry.get("options"):
+            kwargs["options"] = entry["options"]
+    return {"name": name, "mode": mode, "output": resolve(entry["output"]), "inputs": files,
+            "kwargs": kwargs}
+
+
+def run_job(job):
+    # Runs in a pool process. Excel reads stay in this process: the jobs
+    # themselves already keep every core busy.
+    start = time.perf_counter()
+    missing = [f for f in job["inputs"] if not os.path.isfile(f)]
+    if missing:
+        raise FileNotFoundError("input file not found: " + ", ".join(missing))
+    output_dir = os.path.dirname(os.path.abspath(job["output"]))
+    os.makedirs(output_dir, exist_ok=True)
+    if job["mode"] == "pdf":
+        count = merge_engine.merge_pdfs(job["inputs"], job["output"], **job["kwargs"])
+    else:
+        count = merge_engine.merge_excels(job["inputs"], job["output"], workers=1, **job["kwargs"])
+    return {"files": count, "seconds": time.perf_counter() - start,
+            "bytes": os.path.getsize(job["output"])}
+
+
+def run_jobs(jobs, concurrency=0, retries=1, on_update=None):
+    # Runs jobs on a process pool with at most `concurrency` (0 = one per CPU
+    # core) running at once. A failed job is queued again up to `retries`
+    # times. on_update(status) is called whenever a job starts, finishes or
+    # fails. Returns one status dict per job, in manifest order.
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    from concurrent.futures.process import BrokenProcessPool
+
+    if concurrency is None or concurrency < 1:
+        concurrency = os.cpu_count() or 1
+    concurrency = max(1, min(concurrency, len(jobs)))
+    on_update = on_update or (lambda status: None)
+
+    statuses = [{"name": job["name"], "mode": job["mode"], "output": job["output"],
+                 "inputs": len(job["inputs"]), "status": "pending", "attempts": 0,
+                 "seconds": 0.0, "files": None, "bytes": None, "error": None} for job in jobs]
+    queued = deque(range(len(jobs)))
+    running = {}
+    executor = ProcessPoolExecutor(max_workers=concurrency)
+    try:
+        while queued or running:
+            # Only submit what can run now, so "running" means running and
+            # retries go to the back of the queue
+            while queued and len(running) < concurrency:
+                i = queued.popleft()
+                statuses[i]["status"] = "running"
+                statuses[i]["attempts"] += 1
+                running[executor.submit(run_job, jobs[i])] = (i, time.perf_counter())
+                on_update(statuses[i])
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in finished:
+                i, started = running.pop(future)
+                status = statuses[i]
+                status["seconds"] += time.perf_counter() - started
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    # A worker died (e.g. killed for memory); every job that
+                    # was on the pool counts as a failed attempt
+                    broken = True
+                    status["error"] = "worker process died"
+                except Exception as e:
+                    status["error"] = f"{type(e).__name__}: {e}"
+                else:
+                    status.update(status="done", files=result["files"], bytes=result["bytes"],
+                                  error=None)
+                    on_update(status)
+                    continue
+                status["status"] = "pending" if status["attempts"] <= retries else "failed"
+                if status["status"] == "pending":
+                    queued.append(i)
+                on_update(status)
+
+            if broken:
+                for future, (i, started) in running.items():
+                    statuses[i]["seconds"] += time.perf_counter() - started
+                    statuses[i]["error"] = "worker process died"
+                    statuses[i]["status"] = "pending" if statuses[i]["attempts"] <= retries else "failed"
+                    if statuses[i]["status"] == "pending":
+                        queued.append(i)
+                    on_update(statuses[i])
+                running.clear()
+                executor.shutdown(wait=True)
+                executor = ProcessPoolExecutor(max_workers=concurrency)
+    finally:
+        # On Ctrl+C: jobs already running finish, the rest are dropped
+        for future in running:
+            future.cancel()
+        executor.shutdown(wait=True)
+    return statuses
+
+
+def summarize(statuses, elapsed):
+    done = [s for s in statuses if s["status"] == "done"]
+    return {
+        "jobs": len(statuses),
+        "done": len(done),
+        "failed": sum(1 for s in statuses if s["status"] == "failed"),
+        "retried": sum(1 for s in statuses if s["attempts"] > 1),
+        "seconds": round(elapsed, 3),
+        "job_seconds": round(sum(s["seconds"] for s in statuses), 3),
+        "output_bytes": sum(s["bytes"] or 0 for s in done),
+    }
+
+
+def write_report(report_path, statuses, summary):
+    # JSON holds the summary and every job; CSV has one row per job
+    tmp_path = report_path + ".tmp"
+    if report_path.lower().endswith(".csv"):
+        columns = ("name", "mode", "status", "attempts", "seconds", "inputs", "files", "bytes",
+                   "output", "error")
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            for status in statuses:
+                writer.writerow(dict(status, seconds=round(status["seconds"], 3)))
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "jobs": statuses}, f, indent=1)
+    os.replace(tmp_path, report_path)
@@ -0,0 +1,81 @@
+import os
+import json
+
+from workbook_cache import file_sha256
+
+# Sidecar file recording which inputs an output was built from, so the next
+# incremental run knows which inputs are new
+
+
+def manifest_path(output_path):
+    return output_path + ".manifest.json"
+
+
+def fingerprint(path, known=None):
+    # Reuses the recorded hash when size and mtime are unchanged
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    if known and known["path"] == path and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+        return dict(known)
+    return {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": file_sha256(path)}
+
+
+def load_manifest(output_path):
+    try:
+        with open(manifest_path(output_path), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(output_path, mode, inputs, options=None):
+    st = os.stat(output_path)
+    data = {
+        "mode": mode,
+        "options": options,
+        "output": {"size": st.st_size, "mtime_ns": st.st_mtime_ns},
+        "inputs": inputs,
+    }
+    path = manifest_path(output_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def plan_append(mode, files, output_path, options=None, file_options=None):
+    # Returns (new_files, fingerprints). new_files is None when the output has
+    # to be rebuilt: no usable manifest, different merge options, the output
+    # was modified outside of EasyMerge, or a recorded input was changed,
+    # removed, reordered or given different per-file options (file_options
+    # is a {path: options} dict, e.g. PDF page selections).
+    manifest = load_manifest(output_path)
+    recorded = manifest["inputs"] if manifest and manifest.get("mode") == mode else []
+
+    fingerprints = []
+    for i, file_path in enumerate(files):
+        known = recorded[i] if i < len(recorded) else None
+        entry = fingerprint(file_path, known)
+        entry.pop("options", None)
+        if file_options and file_options.get(file_path) is not None:
+            entry["options"] = json.loads(json.dumps(file_options[file_path]))
+        fingerprints.append(entry)
+
+    if not manifest or manifest.get("mode") != mode or not os.path.exists(output_path):
+        return None, fingerprints
+    # Options went through JSON on save, so compare them the same way
+    if manifest.get("options") != json.loads(json.dumps(options)):
+        return None, fingerprints
+
+    st = os.stat(output_path)
+    if manifest["output"] != {"size": st.st_size, "mtime_ns": st.st_mtime_ns}:
+        return None, fingerprints
+
+    if len(recorded) > len(files):
+        return None, fingerprints
+    for old, new in zip(recorded, fingerprints):
+        if old["path"] != new["path"] or old["sha256"] != new["sha256"] \
+                or old.get("options") != new.get("options"):
+            return None, fingerprints
+
+    return list(files[len(recorded):]), fingerprints
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import uuid
+from contextlib import contextmanager
+
+
+class MergeMetrics:
+    # Times merge stages and passes each measurement to sink as a dict:
+    # {"run", "mode", "stage", "file", "seconds", "bytes", "ts"}. Totals per
+    # stage are kept for summary().
+
+    def __init__(self, sink=None, mode=None):
+        self.sink = sink
+        self.mode = mode
+        self.run_id = uuid.uuid4().hex[:12]
+        self.totals = {}
+
+    @contextmanager
+    def stage(self, name, file=None, nbytes=None):
+        # The yielded dict lets the caller fill in bytes once they are known
+        event = {"stage": name, "file": file, "bytes": nbytes}
+        start = time.perf_counter()
+        try:
+            yield event
+        finally:
+            self.record(name, time.perf_counter() - start, file=event["file"], nbytes=event["bytes"])
+
+    def record(self, name, seconds, file=None, nbytes=None, **extra):
+        total = self.totals.setdefault(name, {"count": 0, "seconds": 0.0, "bytes": 0})
+        total["count"] += 1
+        total["seconds"] += seconds
+        total["bytes"] += nbytes or 0
+        # Numeric extras (e.g. object counts) are totalled as well
+        for key, value in extra.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                total[key] = total.get(key, 0) + value
+
+        if self.sink is not None:
+            event = {
+                "ts": time.time(),
+                "run": self.run_id,
+                "mode": self.mode,
+                "stage": name,
+                "file": file,
+                "seconds": round(seconds, 6),
+                "bytes": nbytes,
+            }
+            event.update(extra)
+            self.sink(event)
+
+    def summary(self):
+        return {name: dict(total) for name, total in self.totals.items()}
+
+
+class _NullMetrics:
+    # Stand-in when no metrics were asked for, so the merge code can always
+    # call stage()/record() without checks
+
+    mode = None
+
+    @contextmanager
+    def stage(self, name, file=None, nbytes=None):
+        yield {"stage": name, "file": file, "bytes": nbytes}
+
+    def record(self, name, seconds, file=None, nbytes=None, **extra):
+        pass
+
+    def summary(self):
+        return {}
+
+
+NULL_METRICS = _NullMetrics()
+
+
+class JsonLinesSink:
+    # Appends one JSON object per event, flushing so a tail -f sees them live
+
+    def __init__(self, path):
+        self.file = open(path, "a")
+
+    def __call__(self, event):
+        self.file.write(json.dumps(event) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+@contextmanager
+def profile_run(profile_path=None, trace_memory=False, metrics=None, top=20):
+    # Opt-in capture for a single run: cProfile stats are dumped to
+    # profile_path (open with pstats or snakeviz), and with trace_memory the
+    # largest allocation sites are sent to metrics as "alloc" events
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+    if trace_memory:
+        import tracemalloc
+        tracemalloc.start()
+
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if metrics is not None:
+                metrics.record("python_heap", 0.0, nbytes=peak, current_bytes=current)
+                for stat in snapshot.statistics("lineno")[:top]:
+                    frame = stat.traceback[0]
+                    metrics.record("alloc", 0.0, file=f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                                   nbytes=stat.size, count=stat.count)
@@ -0,0 +1,321 @@
+import os
+import sys
+import json
+import time
+import queue
+import fnmatch
+import threading
+
+import merge_engine
+
+# inotify event bits (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+
+STATE_FILE = ".easymerge-watch.json"
+
+
+class InotifyWatcher:
+    # Linux only, through libc so no extra package is needed. wait() returns
+    # the names that changed, or None when the kernel queue overflowed and
+    # the folder has to be rescanned.
+
+    def __init__(self, folder):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"cannot watch {folder}")
+
+    def wait(self, timeout):
+        import select
+        import struct
+
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        names = set()
+        offset = 0
+        while offset + 16 <= len(data):
+            _, mask, _, length = struct.unpack_from("iIII", data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+            offset += 16 + length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if name:
+                names.add(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    # Fallback for other systems and for network shares, where inotify does
+    # not see changes made by other machines: every wait is a full rescan
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        return None
+
+    def close(self):
+        pass
+
+
+def open_watcher(folder, polling=False):
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folder)
+        except OSError:
+            pass
+    return PollingWatcher()
+
+
+def output_name(pattern, batch_number):
+    # The pattern can use strftime codes and {n} for the batch number; a
+    # name that is already taken gets a -2, -3, ... suffix
+    path = time.strftime(pattern).replace("{n}", str(batch_number))
+    root, ext = os.path.splitext(path)
+    suffix = 2
+    while os.path.exists(path):
+        path = f"{root}-{suffix}{ext}"
+        suffix += 1
+    return path
+
+
+class WatchDaemon:
+    # Merges files as they arrive in a folder. A file is taken once its size
+    # and mtime have not changed for `settle` seconds; settled files are
+    # collected into a batch until no new file has shown up for `debounce`
+    # seconds, or until the batch holds max_batch files. Batches go through a
+    # queue of at most queue_size batches to a single merge worker; when the
+    # worker falls behind the watcher blocks, and new arrivals simply wait
+    # in the folder until there is room again.
+
+    def __init__(self, folder, mode, output_pattern, patterns=None, debounce=5.0, settle=2.0,
+                 max_batch=500, queue_size=2, move_to=None, polling=False, poll_interval=2.0,
+                 rescan_interval=60.0, merge_kwargs=None, log=None):
+        self.folder = os.path.abspath(folder)
+        self.mode = mode
+        self.output_pattern = output_pattern
+        self.patterns = patterns or (["*.pdf"] if mode == "pdf" else ["*.xlsx", "*.xlsm"])
+        self.debounce = debounce
+        self.settle = settle
+        self.max_batch = max_batch
+        self.move_to = os.path.abspath(move_to) if move_to else None
+        self.polling = polling
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.merge_kwargs = merge_kwargs or {}
+        self.log = log or (lambda text: print(text, file=sys.stderr))
+
+        self.batches = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        # path -> (size, mtime_ns, when the file last changed)
+        self.pending = {}
+        # path -> [size, mtime_ns] of files already merged (or queued); shared
+        # with the merge worker, so guarded by lock
+        self.done = {}
+        self.lock = threading.Lock()
+        # Our own outputs, in case they are written into the watched folder
+        self.outputs = set()
+        self.batch_number = 0
+        self.merged_batches = 0
+        self.failed_batches = 0
+
+        output_dir = os.path.dirname(os.path.abspath(time.strftime(output_pattern))) or "."
+        self.state_path = os.path.join(output_dir, STATE_FILE)
+        self.load_state()
+
+    def load_state(self):
+        # Without --move-to, merged files stay in the folder; the state file
+        # keeps them from being merged again after a restart
+        try:
+            with open(self.state_path, "r") as f:
+                self.done = json.load(f).get("done", {})
+        except (OSError, ValueError):
+            self.done = {}
+
+    def save_state(self):
+        with self.lock:
+            self.done = {path: fp for path, fp in self.done.items() if os.path.exists(path)}
+            data = {"folder": self.folder, "done": dict(self.done)}
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.state_path)
+
+    def matches(self, name):
+        # Skips hidden files and Office lock files (~$Book1.xlsx)
+        if name.startswith((".", "~$")):
+            return False
+        return any(fnmatch.fnmatch(name.lower(), pattern.lower()) for pattern in self.patterns)
+
+    def check(self, names, now):
+        # Refreshes the pending entries for names (all files when None)
+        if names is None:
+            try:
+                names = [entry.name for entry in os.scandir(self.folder) if entry.is_file()]
+            except OSError as e:
+                self.log(f"Cannot list {self.folder}: {e}")
+                return
+            # Files that disappeared before settling are forgotten
+            for path in list(self.pending):
+                if os.path.basename(path) not in names:
+                    del self.pending[path]
+
+        for name in names:
+            if not self.matches(name):
+                continue
+            path = os.path.join(self.folder, name)
+            if path in self.outputs:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                self.pending.pop(path, None)
+                continue
+            fingerprint = [st.st_size, st.st_mtime_ns]
+            with self.lock:
+                if self.done.get(path) == fingerprint:
+                    continue
+            known = self.pending.get(path)
+            if known is None or [known[0], known[1]] != fingerprint:
+                self.pending[path] = (st.st_size, st.st_mtime_ns, now)
+
+    def take_batch(self, now):
+        # Settled files, once arrivals have been quiet for debounce seconds
+        # or a full batch is ready
+        settled = sorted(path for path, (_, _, changed) in self.pending.items()
+                         if now - changed >= self.settle)
+        if not settled:
+            return None
+        last_change = max(changed for _, _, changed in self.pending.values())
+        if now - last_change < self.debounce and len(settled) < self.max_batch:
+            return None
+
+        batch = settled[:self.max_batch]
+        with self.lock:
+            for path in batch:
+                size, mtime_ns, _ = self.pending.pop(path)
+                self.done[path] = [size, mtime_ns]
+        return batch
+
+    def submit(self, batch):
+        # Blocks while the queue is full; that is the backpressure
+        while not self.stop_event.is_set():
+            try:
+                self.batches.put(batch, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def watch(self):
+        watcher = open_watcher(self.folder, self.polling)
+        kind = "inotify" if isinstance(watcher, InotifyWatcher) else "polling"
+        self.log(f"Watching {self.folder} ({kind}) for {', '.join(self.patterns)}")
+        try:
+            now = time.monotonic()
+            self.check(None, now)
+            last_scan = now
+            while not self.stop_event.is_set():
+                # Wake up often enough to notice files settling
+                names = watcher.wait(min(self.poll_interval, self.settle, self.debounce) or 0.5)
+                now = time.monotonic()
+                if names is None or now - last_scan >= self.rescan_interval:
+                    self.check(None, now)
+                    last_scan = now
+                else:
+                    self.check(names, now)
+                    # Recheck files still settling, in case a write was missed
+                    self.check([os.path.basename(p) for p in self.pending], now)
+
+                batch = self.take_batch(now)
+                if batch and not self.submit(batch):
+                    break
+        finally:
+            watcher.close()
+            self.batches.put(None)
+
+    def work(self):
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                return
+            self.merge_batch(batch)
+
+    def merge_batch(self, batch):
+        self.batch_number += 1
+        output_path = output_name(self.output_pattern, self.batch_number)
+        self.outputs.add(os.path.abspath(output_path))
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        self.log(f"Merging {len(batch)} files into {output_path}")
+        start = time.monotonic()
+        try:
+            if self.mode == "pdf":
+                merge_engine.merge_pdfs(batch, output_path, **self.merge_kwargs)
+            else:
+                merge_engine.merge_excels(batch, output_path, **self.merge_kwargs)
+        except Exception as e:
+            # The files stay marked as done so a broken file isn't retried
+            # forever; touching or re-copying it queues it again
+            self.failed_batches += 1
+            self.log(f"Failed to merge batch {self.batch_number}: {e}")
+        else:
+            self.merged_batches += 1
+            self.log(f"Wrote {output_path} in {time.monotonic() - start:.1f}s")
+            # Remembered like an input, so a restart doesn't merge our own
+            # output when it is written into the watched folder
+            st = os.stat(output_path)
+            with self.lock:
+                self.done[os.path.abspath(output_path)] = [st.st_size, st.st_mtime_ns]
+            if self.move_to:
+                self.move_inputs(batch)
+        self.save_state()
+
+    def move_inputs(self, batch):
+        os.makedirs(self.move_to, exist_ok=True)
+        for path in batch:
+            target = os.path.join(self.move_to, os.path.basename(path))
+            root, ext = os.path.splitext(target)
+            suffix = 2
+            while os.path.exists(target):
+                target = f"{root}-{suffix}{ext}"
+                suffix += 1
+            try:
+                os.replace(path, target)
+                with self.lock:
+                    self.done.pop(path, None)
+            except OSError as e:
+                self.log(f"Could not move {path}: {e}")
+
+    def run(self):
+        # Watches until stop() (or Ctrl+C); the batch being merged is finished
+        # and queued batches are merged before returning
+        worker = threading.Thread(target=self.work, daemon=True)
+        worker.start()
+        try:
+            self.watch()
+        except KeyboardInterrupt:
+            # watch() has already queued the end marker for the worker
+            self.stop_event.set()
+        worker.join()
+
+    def stop(self):
+        self.stop_event.set()
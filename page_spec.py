@@ -0,0 +1,70 @@
+# Page selections for PDF merges, e.g. "1,3-10", "end-1" (reversed) or
+# "2-5@90" (rotated clockwise). Pages are numbered from 1, "end" is the last
+# page, "N-" runs to the end, and ranges are kept in the order given, so a
+# selection can also reorder and repeat pages.
+
+
+def split_page_spec(spec):
+    # Returns [(start, end, rotate)] with start/end as page numbers or "end";
+    # raises ValueError for anything malformed
+    items = []
+    for item in spec.split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+
+        rotate = 0
+        if "@" in item:
+            item, _, angle = item.partition("@")
+            try:
+                rotate = int(angle)
+            except ValueError:
+                raise ValueError(f"Bad rotation {angle!r} in page selection {spec!r}")
+            if rotate % 90:
+                raise ValueError(f"Rotation must be a multiple of 90, got {rotate} in {spec!r}")
+
+        if "-" in item:
+            start, _, end = item.partition("-")
+            start = _page_number(start or "1", spec)
+            end = _page_number(end or "end", spec)
+        else:
+            start = end = _page_number(item, spec)
+        items.append((start, end, rotate % 360))
+
+    if not items:
+        raise ValueError(f"Empty page selection {spec!r}")
+    return items
+
+
+def resolve_pages(files, pages, default=None):
+    # Per-file selections {path: spec} win over the default spec for the other
+    # files. Returns a {path: spec} dict, the default alone when no file has
+    # its own, or None; raises ValueError if any spec is malformed.
+    if default:
+        pages = {f: pages.get(f, default) for f in files} if pages else default
+    for spec in (set(pages.values()) if isinstance(pages, dict) else [pages] if pages else []):
+        split_page_spec(spec)
+    return pages or None
+
+
+def _page_number(text, spec):
+    text = text.strip()
+    if text == "end":
+        return "end"
+    if not text.isdigit() or int(text) < 1:
+        raise ValueError(f"Bad page number {text!r} in page selection {spec!r}")
+    return int(text)
+
+
+def select_pages(spec, page_count):
+    # Returns [(0-based page index, rotate)] for a document with page_count pages
+    selection = []
+    for start, end, rotate in split_page_spec(spec):
+        start = page_count if start == "end" else start
+        end = page_count if end == "end" else end
+        for number in (start, end):
+            if number > page_count:
+                raise ValueError(f"Page {number} is out of range, the document has {page_count} pages")
+        step = 1 if end >= start else -1
+        selection.extend((number - 1, rotate) for number in range(start, end + step, step))
+    return selection
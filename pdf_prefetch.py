@@ -0,0 +1,117 @@
+import io
+import os
+import re
+import mmap
+import time
+from contextlib import closing
+
+from merge_metrics import NULL_METRICS
+
+# Reads PDF inputs ahead of the merge on a few threads, so the next files are
+# already loaded while the current one is parsed. Local files are memory
+# mapped instead of copied into Python bytes: PdfReader reads straight from
+# the mapping, while PdfMerger still copies each input into its own buffer.
+# Files on network filesystems are read into memory in the background, since
+# page faults on a mapped network file would stall the parse on the share's
+# latency again (and a file changed on the server while mapped can crash the
+# process).
+
+DEFAULT_READ_AHEAD = 2
+
+REMOTE_FILESYSTEMS = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "ncpfs", "afs", "9p", "ceph", "glusterfs",
+    "lustre", "gpfs", "davfs", "fuse.sshfs", "fuse.rclone", "fuse.s3fs",
+}
+
+# [(mount point, filesystem type)], longest mount point first
+_mounts = None
+
+
+def _linux_mounts():
+    global _mounts
+    if _mounts is None:
+        mounts = []
+        try:
+            with open("/proc/mounts", "r") as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) >= 3:
+                        # Spaces and tabs in mount points are octal escapes
+                        mountpoint = re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), fields[1])
+                        mounts.append((mountpoint, fields[2]))
+        except OSError:
+            pass
+        _mounts = sorted(mounts, key=lambda mount: len(mount[0]), reverse=True)
+    return _mounts
+
+
+def is_remote(path):
+    path = os.path.realpath(path)
+    if os.name == "nt":
+        if path.startswith("\\\\"):
+            return True
+        import ctypes
+        drive = os.path.splitdrive(path)[0]
+        DRIVE_REMOTE = 4
+        return bool(drive) and ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") == DRIVE_REMOTE
+    for mountpoint, fstype in _linux_mounts():
+        if path == mountpoint or path.startswith(mountpoint.rstrip("/") + "/"):
+            return fstype in REMOTE_FILESYSTEMS
+    return False
+
+
+def open_input(pdf_path, use_mmap=True):
+    # Returns (stream, size, seconds); the stream is an mmap or a BytesIO,
+    # both of which PdfReader and PdfMerger read like a file
+    start = time.perf_counter()
+    with open(pdf_path, "rb") as fh:
+        size = os.fstat(fh.fileno()).st_size
+        if use_mmap and size and not is_remote(pdf_path):
+            stream = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(stream, "madvise"):
+                # Start the kernel reading the file in now, not on first touch
+                stream.madvise(mmap.MADV_WILLNEED)
+        else:
+            stream = io.BytesIO(fh.read())
+    return stream, size, time.perf_counter() - start
+
+
+def _prefetch(files, read_ahead, use_mmap, metrics):
+    if read_ahead < 1:
+        for pdf_path in files:
+            with metrics.stage("read", pdf_path) as stage:
+                stream, stage["bytes"], _ = open_input(pdf_path, use_mmap)
+            yield pdf_path, stream
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    executor = ThreadPoolExecutor(max_workers=read_ahead)
+    futures = {}
+    try:
+        for i, pdf_path in enumerate(files):
+            for j in range(i, min(len(files), i + read_ahead + 1)):
+                if j not in futures:
+                    futures[j] = executor.submit(open_input, files[j], use_mmap)
+            # "wait" is the I/O the read-ahead did not hide
+            with metrics.stage("wait", pdf_path):
+                stream, size, seconds = futures.pop(i).result()
+            metrics.record("read", seconds, file=pdf_path, nbytes=size)
+            yield pdf_path, stream
+    finally:
+        # Stopped early (cancel or error): release what was already read
+        for future in futures.values():
+            if not future.cancel():
+                try:
+                    future.result()[0].close()
+                except Exception:
+                    pass
+        executor.shutdown(wait=True)
+
+
+def prefetch_inputs(files, read_ahead=DEFAULT_READ_AHEAD, use_mmap=True, metrics=NULL_METRICS):
+    # Yields (path, stream) in input order, with up to read_ahead files being
+    # read in the background (0 reads each file when it is reached). The
+    # caller closes each stream once it is done with it. Use as a context
+    # manager so prefetched files are released if the loop stops early.
+    return closing(_prefetch(files, read_ahead, use_mmap, metrics))
@@ -0,0 +1,391 @@
+import io
+import os
+import zlib
+import hashlib
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (ArrayObject, DictionaryObject, IndirectObject, NameObject,
+                            NullObject, NumberObject, StreamObject)
+
+from merge_metrics import NULL_METRICS
+from page_spec import select_pages
+from pdf_prefetch import DEFAULT_READ_AHEAD, prefetch_inputs
+
+# Object numbers reserved for the document catalog and the page tree root
+CATALOG_ID = 1
+PAGES_ID = 2
+
+# Marks an object whose copy is still being built, to detect reference cycles
+_COPYING = object()
+
+
+class StreamingPdfWriter:
+    # Writes pages straight to the output file as they are added. Only the
+    # xref offsets and the list of page object numbers are kept for the whole
+    # run, everything else is bounded by the single input being copied.
+    #
+    # With optimize, objects are copied children first, so each one is
+    # complete (its references already point at output objects) before it is
+    # written. Identical objects, e.g. the same font or logo embedded in every
+    # input, are then written once and shared, and uncompressed streams are
+    # Flate-compressed. A digest per distinct object is kept for the run.
+
+    def __init__(self, stream, update=None, optimize=False):
+        self.stream = stream
+        self.optimize = optimize
+        self.digests = {}
+        self.saved = {"duplicate_objects": 0, "duplicate_bytes": 0,
+                      "compressed_streams": 0, "compressed_bytes": 0}
+        self.offsets = {}
+        self.page_ids = []
+        self.written_pages = set()
+        self.ref_map = {}
+        self.pending = []
+
+        # update describes an existing file this writer appends an incremental
+        # update to, see read_update_info
+        self.update = update
+        if update is None:
+            self.pages_id = PAGES_ID
+            self.next_id = PAGES_ID + 1
+            self.stream.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        else:
+            self.pages_id = update["pages_id"]
+            self.next_id = update["size"]
+            self.stream.write(b"\n")
+
+    def begin_document(self):
+        # Object numbers from different inputs must never be mixed up
+        self.ref_map = {}
+
+    def add_page(self, page, rotate=0):
+        # Only the objects this page refers to are copied. A page that is
+        # added again (a repeated page selection) becomes a separate page
+        # object sharing the first copy's content and resources.
+        page_ref = getattr(page, "indirect_reference", None)
+        page_id = self.ref_map.get(page_ref.idnum) if page_ref is not None else None
+        if page_id is None or page_id in self.written_pages:
+            page_id = self.allocate_id()
+            if page_ref is not None and page_ref.idnum not in self.ref_map:
+                self.ref_map[page_ref.idnum] = page_id
+
+        page_dict = DictionaryObject()
+        for key, value in page.items():
+            if key == "/Parent":
+                continue
+            page_dict[NameObject(key)] = self.remap(value)
+        page_dict[NameObject("/Parent")] = IndirectObject(self.pages_id, 0, None)
+        if rotate:
+            current = int(page.get("/Rotate", 0))
+            page_dict[NameObject("/Rotate")] = NumberObject((current + rotate) % 360)
+
+        self.write_object(page_id, page_dict)
+        self.page_ids.append(page_id)
+        self.written_pages.add(page_id)
+        self.flush_pending()
+        return page_id
+
+    def add_document(self, reader, selection=None):
+        # selection is a list of (page index, rotate) as from select_pages;
+        # pages that are not selected are never read or copied
+        self.begin_document()
+        if selection is None:
+            for page in reader.pages:
+                self.add_page(page)
+            return
+        for index, rotate in selection:
+            self.add_page(reader.pages[index], rotate)
+
+    def close(self):
+        if self.update is None:
+            prior_kids, prior_count = [], 0
+        else:
+            prior_kids, prior_count = self.update["kids"], self.update["count"]
+
+        pages = DictionaryObject()
+        pages[NameObject("/Type")] = NameObject("/Pages")
+        pages[NameObject("/Kids")] = ArrayObject(
+            [IndirectObject(i, 0, None) for i in prior_kids] +
+            [IndirectObject(i, 0, None) for i in self.page_ids])
+        pages[NameObject("/Count")] = NumberObject(prior_count + len(self.page_ids))
+        self.write_object(self.pages_id, pages)
+
+        if self.update is None:
+            catalog = DictionaryObject()
+            catalog[NameObject("/Type")] = NameObject("/Catalog")
+            catalog[NameObject("/Pages")] = IndirectObject(self.pages_id, 0, None)
+            self.write_object(CATALOG_ID, catalog)
+
+        xref_offset = self.stream.tell()
+        self.write_xref()
+
+        size = self.next_id
+        trailer = f"trailer\n<< /Size {size}"
+        if self.update is None:
+            trailer += f" /Root {CATALOG_ID} 0 R"
+        else:
+            trailer += f" /Root {self.update['root_id']} 0 R /Prev {self.update['startxref']}"
+            if self.update.get("info_id") is not None:
+                trailer += f" /Info {self.update['info_id']} 0 R"
+        self.stream.write(f"{trailer} >>\n".encode())
+        self.stream.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+    def write_xref(self):
+        # A new file lists every object from 0; an update lists only the
+        # objects it (re)wrote, grouped into runs of consecutive numbers
+        self.stream.write(b"xref\n")
+        if self.update is None:
+            ids = list(range(0, self.next_id))
+        else:
+            # Object 0 heads every section so readers never see a non-zero-indexed table
+            ids = [0] + sorted(self.offsets)
+
+        run_start = 0
+        while run_start < len(ids):
+            run_end = run_start + 1
+            while run_end < len(ids) and ids[run_end] == ids[run_end - 1] + 1:
+                run_end += 1
+            self.stream.write(f"{ids[run_start]} {run_end - run_start}\n".encode())
+            for idnum in ids[run_start:run_end]:
+                offset = self.offsets.get(idnum)
+                if offset is None:
+                    self.stream.write(b"0000000000 65535 f \n")
+                else:
+                    self.stream.write(f"{offset:010d} 00000 n \n".encode())
+            run_start = run_end
+
+    def allocate_id(self):
+        idnum = self.next_id
+        self.next_id += 1
+        return idnum
+
+    def remap(self, obj):
+        # Returns a copy of obj whose references point at output object numbers
+        if isinstance(obj, IndirectObject) and self.optimize:
+            return IndirectObject(self.copy_ref(obj), 0, None)
+
+        if isinstance(obj, IndirectObject):
+            idnum = self.ref_map.get(obj.idnum)
+            if idnum is None:
+                idnum = self.allocate_id()
+                self.ref_map[obj.idnum] = idnum
+                self.pending.append((idnum, obj))
+            return IndirectObject(idnum, 0, None)
+
+        if isinstance(obj, StreamObject):
+            copy = obj.__class__()
+            copy._data = obj._data
+            for key, value in obj.items():
+                copy[NameObject(key)] = self.remap(value)
+            return copy
+
+        if isinstance(obj, DictionaryObject):
+            copy = DictionaryObject()
+            for key, value in obj.items():
+                copy[NameObject(key)] = self.remap(value)
+            return copy
+
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self.remap(item) for item in obj)
+
+        return obj
+
+    def copy_ref(self, ref):
+        # Copies the object behind ref (and everything it refers to) and
+        # returns its output object number, reusing an identical object that
+        # was already written
+        idnum = self.ref_map.get(ref.idnum)
+        if idnum is _COPYING:
+            # A reference cycle back to an object still being copied: give it
+            # its number now; it is written under that number, undeduplicated
+            idnum = self.allocate_id()
+            self.ref_map[ref.idnum] = idnum
+            return idnum
+        if idnum is not None:
+            return idnum
+
+        obj = ref.get_object()
+        if isinstance(obj, DictionaryObject) and obj.get("/Type") in ("/Page", "/Pages"):
+            # Left for flush_pending, like without optimize
+            idnum = self.allocate_id()
+            self.ref_map[ref.idnum] = idnum
+            self.pending.append((idnum, ref))
+            return idnum
+
+        self.ref_map[ref.idnum] = _COPYING
+        copy = self.remap(obj)
+        if isinstance(copy, StreamObject):
+            self.compress(copy)
+        data = self.serialize(copy)
+
+        idnum = self.ref_map[ref.idnum]
+        if idnum is not _COPYING:
+            self.write_raw(idnum, data)
+            return idnum
+
+        digest = hashlib.sha256(data).digest()
+        idnum = self.digests.get(digest)
+        if idnum is None:
+            idnum = self.allocate_id()
+            self.write_raw(idnum, data)
+            self.digests[digest] = idnum
+        else:
+            self.saved["duplicate_objects"] += 1
+            self.saved["duplicate_bytes"] += len(data)
+        self.ref_map[ref.idnum] = idnum
+        return idnum
+
+    def compress(self, stream):
+        # Streams stored without any filter are Flate-compressed when that
+        # makes them smaller; already filtered streams are left as they are
+        if "/Filter" in stream or "/DecodeParms" in stream:
+            return
+        data = stream._data
+        compressed = zlib.compress(data)
+        if len(compressed) < len(data):
+            stream._data = compressed
+            stream[NameObject("/Filter")] = NameObject("/FlateDecode")
+            self.saved["compressed_streams"] += 1
+            self.saved["compressed_bytes"] += len(data) - len(compressed)
+
+    def report(self):
+        return dict(self.saved, pages=len(self.page_ids),
+                    saved_bytes=self.saved["duplicate_bytes"] + self.saved["compressed_bytes"])
+
+    def flush_pending(self):
+        while self.pending:
+            idnum, ref = self.pending.pop()
+            obj = ref.get_object()
+
+            # Links to pages that are not copied (or to a source page tree)
+            # would drag whole documents along, so they are dropped
+            if isinstance(obj, DictionaryObject) and obj.get("/Type") in ("/Page", "/Pages"):
+                obj = NullObject()
+            else:
+                obj = self.remap(obj)
+
+            self.write_object(idnum, obj)
+
+    def write_object(self, idnum, obj):
+        self.write_raw(idnum, self.serialize(obj))
+
+    def serialize(self, obj):
+        if obj is None:
+            obj = NullObject()
+        buffer = io.BytesIO()
+        obj.write_to_stream(buffer, None)
+        return buffer.getvalue()
+
+    def write_raw(self, idnum, data):
+        self.offsets[idnum] = self.stream.tell()
+        self.stream.write(f"{idnum} 0 obj\n".encode())
+        self.stream.write(data)
+        self.stream.write(b"\nendobj\n")
+
+
+def page_spec_for(pages, pdf_path):
+    # pages is one selection for every file or a {path: selection} dict
+    if isinstance(pages, dict):
+        return pages.get(pdf_path)
+    return pages
+
+
+def _copy_documents(writer, files, on_file, metrics, pages=None, read_ahead=DEFAULT_READ_AHEAD):
+    # Copies one input at a time; each input is released once it is copied,
+    # so at most read_ahead + 1 inputs are held at once
+    with prefetch_inputs(files, read_ahead, metrics=metrics) as inputs:
+        for pdf_path, data in inputs:
+            try:
+                if on_file is not None:
+                    on_file(pdf_path)
+                with metrics.stage("copy", pdf_path) as stage:
+                    start = writer.stream.tell()
+                    reader = PdfReader(data)
+                    selection = None
+                    spec = page_spec_for(pages, pdf_path)
+                    if spec:
+                        try:
+                            selection = select_pages(spec, len(reader.pages))
+                        except ValueError as e:
+                            raise ValueError(f"{os.path.basename(pdf_path)}: {e}")
+                    writer.add_document(reader, selection)
+                    stage["bytes"] = writer.stream.tell() - start
+            finally:
+                data.close()
+
+
+def _finish(writer, metrics):
+    with metrics.stage("finalize") as stage:
+        start = writer.stream.tell()
+        writer.close()
+        stage["bytes"] = writer.stream.tell() - start
+
+
+def stream_merge_pdfs(files, output_path, on_file=None, metrics=NULL_METRICS, pages=None,
+                      optimize=False, read_ahead=DEFAULT_READ_AHEAD):
+    # Returns the writer's report: pages written and bytes saved by optimize
+    with open(output_path, "wb") as out:
+        writer = StreamingPdfWriter(out, optimize=optimize)
+        _copy_documents(writer, files, on_file, metrics, pages, read_ahead)
+        _finish(writer, metrics)
+    return writer.report()
+
+
+def read_update_info(pdf_path):
+    # What an incremental update needs to know about an existing file, or None
+    # if the file can't take one (cross-reference streams, nested page trees)
+    with open(pdf_path, "rb") as fh:
+        reader = PdfReader(fh)
+        if reader.is_encrypted:
+            return None
+
+        root_ref = reader.trailer.raw_get("/Root")
+        pages_ref = root_ref.get_object().raw_get("/Pages")
+        if not isinstance(root_ref, IndirectObject) or not isinstance(pages_ref, IndirectObject):
+            return None
+
+        pages = pages_ref.get_object()
+        kids = []
+        for kid in pages["/Kids"]:
+            if kid.get_object().get("/Type") != "/Page":
+                return None
+            kids.append(kid.idnum)
+
+        fh.seek(0, 2)
+        file_size = fh.tell()
+        fh.seek(max(0, file_size - 1024))
+        tail = fh.read()
+        startxref = int(tail[tail.rindex(b"startxref") + 9:].split()[0])
+
+        # Only classic xref tables are extended; xref streams need a stream update
+        fh.seek(startxref)
+        if not fh.read(4) == b"xref":
+            return None
+
+    info_ref = reader.trailer.raw_get("/Info") if "/Info" in reader.trailer else None
+    return {
+        "root_id": root_ref.idnum,
+        "pages_id": pages_ref.idnum,
+        "kids": kids,
+        "count": len(kids),
+        "size": int(reader.trailer["/Size"]),
+        "startxref": startxref,
+        "info_id": info_ref.idnum if isinstance(info_ref, IndirectObject) else None,
+    }
+
+
+def append_pdfs(output_path, files, on_file=None, metrics=NULL_METRICS, pages=None, optimize=False,
+                read_ahead=DEFAULT_READ_AHEAD):
+    # Appends the pages of files to output_path as a PDF incremental update:
+    # the existing bytes are left alone and only new objects, a rewritten page
+    # tree root and a new xref section are added at the end
+    update = read_update_info(output_path)
+    if update is None:
+        raise ValueError(f"{output_path} cannot be updated incrementally")
+
+    with open(output_path, "ab") as out:
+        writer = StreamingPdfWriter(out, update, optimize)
+        _copy_documents(writer, files, on_file, metrics, pages, read_ahead)
+        _finish(writer, metrics)
+    return writer.report()
+
@@ -0,0 +1,200 @@
+import os
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+# Session data lives in SQLite: every add, remove or clear only writes the
+# rows it touches, and a crash mid-write rolls back instead of leaving a
+# corrupt file. Writes are queued and committed on a background thread, a
+# batch at a time, so the UI never waits on the disk; only saved selections,
+# one row each, are committed straight away.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (mode TEXT, position INTEGER, path TEXT, PRIMARY KEY (mode, path));
+CREATE INDEX IF NOT EXISTS files_order ON files (mode, position);
+CREATE TABLE IF NOT EXISTS metadata (path TEXT PRIMARY KEY, info TEXT);
+CREATE TABLE IF NOT EXISTS selections (name TEXT PRIMARY KEY, mode TEXT, count INTEGER, saved REAL, paths TEXT);
+"""
+
+
+class SessionStore:
+    # Reads run on the calling thread and see what has been committed so
+    # far; writes return at once and are committed `delay` seconds after the
+    # first of them, together with whatever else arrived meanwhile.
+
+    def __init__(self, path, legacy_json=None, delay=0.5):
+        self.path = path
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            # Counts for files no longer listed anywhere aren't worth keeping
+            self.conn.execute("DELETE FROM metadata WHERE path NOT IN (SELECT path FROM files)")
+        if legacy_json and os.path.exists(legacy_json) and self.is_empty():
+            self.import_json(legacy_json)
+
+        self.ops = queue.Queue()
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
+    def is_empty(self):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT (SELECT COUNT(*) FROM files) + (SELECT COUNT(*) FROM settings)").fetchone()
+        return row[0] == 0
+
+    def import_json(self, json_path):
+        # One-off move from the old session.json
+        try:
+            with open(json_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print("Could not import old session:", e)
+            return
+        with self.lock, self.conn:
+            for mode in ("pdf", "excel"):
+                self._add_files(mode, data.get(f"{mode}_files", []))
+            self._set_setting("current_tab", data.get("current_tab", "pdf"))
+
+    # Reads
+
+    def get_setting(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def load_files(self, mode):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path FROM files WHERE mode = ? ORDER BY position", (mode,)).fetchall()
+        return [path for path, in rows]
+
+    def load_metadata(self, mode):
+        # Cached sizes and page/row counts for the files listed under mode
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT m.path, m.info FROM metadata m JOIN files f ON f.path = m.path "
+                "WHERE f.mode = ?", (mode,)).fetchall()
+        return {path: json.loads(info) for path, info in rows}
+
+    def list_selections(self, mode=None):
+        # [(name, mode, file count)], most recently saved first
+        query = "SELECT name, mode, count FROM selections"
+        args = ()
+        if mode is not None:
+            query += " WHERE mode = ?"
+            args = (mode,)
+        with self.lock:
+            return self.conn.execute(query + " ORDER BY saved DESC", args).fetchall()
+
+    def load_selection(self, name):
+        # Returns (mode, paths), or None for an unknown name
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT mode, paths FROM selections WHERE name = ?", (name,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    # Writes, queued for the writer thread
+
+    def set_setting(self, key, value):
+        self.ops.put((self._set_setting, (key, value)))
+
+    def add_files(self, mode, paths):
+        if paths:
+            self.ops.put((self._add_files, (mode, list(paths))))
+
+    def remove_files(self, mode, paths):
+        if paths:
+            self.ops.put((self._remove_files, (mode, list(paths))))
+
+    def clear_files(self, mode):
+        self.ops.put((self._clear_files, (mode,)))
+
+    def put_metadata(self, path, info):
+        self.ops.put((self._put_metadata, (path, dict(info))))
+
+    # Selections are a single row each and are read back right away, so they
+    # are committed at once rather than queued; reads then never have to wait
+    # for the queue to drain
+
+    def save_selection(self, name, mode, paths):
+        with self.lock, self.conn:
+            self._save_selection(name, mode, list(paths))
+
+    def delete_selection(self, name):
+        with self.lock, self.conn:
+            self._delete_selection(name)
+
+    def flush(self):
+        # Blocks until every queued write is committed
+        self.ops.join()
+
+    def close(self):
+        self.ops.put(None)
+        self.writer.join()
+        self.conn.close()
+
+    def write_loop(self):
+        while True:
+            op = self.ops.get()
+            batch = [op]
+            if op is not None:
+                # Let a burst of changes settle into one transaction
+                time.sleep(self.delay)
+                while True:
+                    try:
+                        batch.append(self.ops.get_nowait())
+                    except queue.Empty:
+                        break
+
+            stop = None in batch
+            try:
+                with self.lock, self.conn:
+                    for op in batch:
+                        if op is not None:
+                            op[0](*op[1])
+            except Exception as e:
+                print("Could not save session:", e)
+            finally:
+                for _ in batch:
+                    self.ops.task_done()
+            if stop:
+                return
+
+    # The statements behind the queued writes; callers hold the lock and
+    # the transaction
+
+    def _set_setting(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                          (key, json.dumps(value)))
+
+    def _add_files(self, mode, paths):
+        start = self.conn.execute(
+            "SELECT COALESCE(MAX(position), -1) + 1 FROM files WHERE mode = ?", (mode,)).fetchone()[0]
+        self.conn.executemany("INSERT OR IGNORE INTO files (mode, position, path) VALUES (?, ?, ?)",
+                              [(mode, start + i, path) for i, path in enumerate(paths)])
+
+    def _remove_files(self, mode, paths):
+        self.conn.executemany("DELETE FROM files WHERE mode = ? AND path = ?",
+                              [(mode, path) for path in paths])
+
+    def _clear_files(self, mode):
+        self.conn.execute("DELETE FROM files WHERE mode = ?", (mode,))
+
+    def _put_metadata(self, path, info):
+        self.conn.execute("INSERT OR REPLACE INTO metadata (path, info) VALUES (?, ?)",
+                          (path, json.dumps(info)))
+
+    def _save_selection(self, name, mode, paths):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO selections (name, mode, count, saved, paths) VALUES (?, ?, ?, ?, ?)",
+            (name, mode, len(paths), time.time(), json.dumps(paths)))
+
+    def _delete_selection(self, name):
+        self.conn.execute("DELETE FROM selections WHERE name = ?", (name,))
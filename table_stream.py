@@ -0,0 +1,167 @@
+import os
+import csv
+
+# Output format per file extension; anything else is written as .xlsx
+FORMAT_EXTENSIONS = {
+    ".xlsx": "xlsx",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+}
+FORMATS = ("xlsx", "csv", "parquet", "feather")
+
+
+def output_format(output_path, fmt=None):
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown output format {fmt!r} (expected one of {', '.join(FORMATS)})")
+        return fmt
+    return FORMAT_EXTENSIONS.get(os.path.splitext(output_path)[1].lower(), "xlsx")
+
+
+def open_table_writer(fmt, output_path, columns):
+    if fmt == "csv":
+        return CsvStreamWriter(output_path, columns)
+    if fmt == "parquet":
+        return ParquetStreamWriter(output_path, columns)
+    if fmt == "feather":
+        return FeatherStreamWriter(output_path, columns)
+    raise ValueError(f"No streaming table writer for {fmt!r}")
+
+
+def read_csv_header(output_path):
+    with open(output_path, "r", newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+class CsvStreamWriter:
+    # Writes each frame's rows as soon as it arrives; append=True continues an
+    # existing file whose header already lists `columns`
+
+    def __init__(self, output_path, columns, append=False):
+        self.columns = list(columns)
+        self.total_rows = 0
+        self.file = open(output_path, "a" if append else "w", newline="", encoding="utf-8")
+        if not append:
+            csv.writer(self.file).writerow([str(column) for column in self.columns])
+
+    def append_frame(self, df):
+        df = df.reindex(columns=self.columns)
+        df.to_csv(self.file, header=False, index=False)
+        self.total_rows += len(df)
+
+    def close(self):
+        self.file.close()
+
+
+class _ArrowStreamWriter:
+    # Converts each frame to an Arrow table and writes it straight out, so the
+    # combined data never exists in memory. The first frame fixes the column
+    # types: mixed or text columns become strings, and columns that are empty
+    # in the first frame are written as strings too. Excel keeps every number
+    # as a double, so integer columns are written as float64 and later files
+    # with fractions or blanks still fit. Later frames are cast to those types;
+    # a column that turns to text in a later file needs --dtype COL=str.
+
+    def __init__(self, output_path, columns):
+        # Fail before any reading is done when pyarrow isn't installed
+        import pyarrow
+
+        self.output_path = output_path
+        self.columns = list(columns)
+        self.schema = None
+        self.writer = None
+        self.total_rows = 0
+
+    def prepare(self, df):
+        import pyarrow as pa
+
+        df = df.reindex(columns=self.columns)
+        string_columns = [column for column in df.columns if df[column].dtype == object]
+        if self.schema is None:
+            string_columns += [column for column in df.columns
+                               if column not in string_columns and df[column].isna().all()]
+        else:
+            string_columns += [field.name for field in self.schema
+                               if (pa.types.is_string(field.type) or pa.types.is_large_string(field.type))
+                               and field.name not in string_columns]
+        # Columns a file doesn't have (or leaves blank) are written as nulls of
+        # whatever type the column has
+        empty_columns = [column for column in df.columns
+                         if column not in string_columns and df[column].isna().all()]
+        if string_columns or empty_columns:
+            df = df.copy()
+            for column in string_columns:
+                values = df[column].astype(str).astype(object)
+                values[df[column].isna()] = None
+                df[column] = values
+            for column in empty_columns:
+                df[column] = [None] * len(df)
+        return df
+
+    def append_frame(self, df):
+        import pyarrow as pa
+
+        df = self.prepare(df)
+        if self.schema is None:
+            schema = pa.Schema.from_pandas(df, preserve_index=False)
+            fields = []
+            for field in schema:
+                if pa.types.is_null(field.type):
+                    field = field.with_type(pa.string())
+                elif pa.types.is_integer(field.type):
+                    field = field.with_type(pa.float64())
+                fields.append(field)
+            self.schema = pa.schema(fields)
+            self.writer = self.open_writer(self.schema)
+        try:
+            table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            raise ValueError(self.mismatch(df, e)) from e
+        self.writer.write_table(table)
+        self.total_rows += len(df)
+
+    def mismatch(self, df, error):
+        # Names the first column whose values don't fit the type the earlier
+        # files gave it; the schema can't change once rows are written
+        import pyarrow as pa
+
+        for field in self.schema:
+            try:
+                pa.array(df[field.name], type=field.type, from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                return (f"Column {field.name!r} was read as {field.type} from the earlier files but "
+                        f"holds other values here; merge with --dtype \"{field.name}=str\" to keep it as text")
+        return f"Column types don't match the earlier files: {error}"
+
+    def close(self):
+        import pyarrow as pa
+
+        if self.writer is None:
+            # No rows at all: still leave a file holding the columns
+            self.schema = pa.schema([pa.field(str(column), pa.string()) for column in self.columns])
+            self.writer = self.open_writer(self.schema)
+        self.writer.close()
+
+
+class ParquetStreamWriter(_ArrowStreamWriter):
+    # Every appended frame becomes its own row group
+
+    def open_writer(self, schema):
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(self.output_path, schema)
+
+
+class FeatherStreamWriter(_ArrowStreamWriter):
+    # Feather v2 is the Arrow IPC file format, which can be written batch by batch
+
+    def open_writer(self, schema):
+        import pyarrow as pa
+        self.sink = pa.OSFile(self.output_path, "wb")
+        return pa.ipc.new_file(self.sink, schema)
+
+    def close(self):
+        super().close()
+        self.sink.close()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from excel_schema import clean_header, common_dtype, header_key, merge_headers, unify_frames
+
+
+def test_header_key_ignores_case_and_spacing():
+    assert header_key("  Customer   ID") == header_key("customer id")
+    assert header_key(3) == 3
+
+
+def test_clean_header_applies_rename_rules():
+    assert clean_header(" Order  No ") == "Order No"
+    assert clean_header("order no", {"Order No": "Order"}) == "Order"
+
+
+def test_merge_headers_keeps_first_spelling():
+    columns, canonical = merge_headers([["Name", "Total"], ["name", "Region"]])
+    assert columns == ["Name", "Total", "Region"]
+    assert canonical[header_key("NAME")] == "Name"
+
+
+def test_common_dtype_same_dtype_needs_no_cast():
+    assert common_dtype([np.dtype("float64"), np.dtype("float64")], False) is None
+    assert common_dtype([np.dtype("int64")], False) is None
+
+
+def test_common_dtype_missing_values():
+    assert common_dtype([np.dtype("int64")], True) == "Int64"
+    assert common_dtype([np.dtype("bool")], True) == "boolean"
+
+
+def test_common_dtype_numbers():
+    assert common_dtype([np.dtype("int64"), np.dtype("float64")], False) == "float64"
+
+
+def test_common_dtype_text_only_when_textual():
+    assert common_dtype([np.dtype(object), np.dtype(object)], False, textual=True) == "string"
+    assert common_dtype([np.dtype(object), np.dtype("int64")], False, textual=False) is None
+
+
+def test_unify_frames_matches_headers():
+    a = pd.DataFrame({"Customer ID": [1, 2]})
+    b = pd.DataFrame({"customer  id": [3]})
+    frames = unify_frames([a, b])
+    assert [list(df.columns) for df in frames] == [["Customer ID"], ["Customer ID"]]
+
+
+def test_unify_frames_keeps_numbers_in_mixed_columns():
+    a = pd.DataFrame({"Mixed": [1, "x", 2.5]})
+    b = pd.DataFrame({"Mixed": [7, 8]})
+    merged = pd.concat(unify_frames([a, b]), ignore_index=True)
+    assert merged["Mixed"].tolist() == [1, "x", 2.5, 7, 8]
+    assert not isinstance(merged["Mixed"].dtype, pd.StringDtype)
+
+
+def test_unify_frames_text_columns_become_strings():
+    a = pd.DataFrame({"Name": ["a", None]})
+    b = pd.DataFrame({"Name": ["b"]})
+    frames = unify_frames([a, b])
+    assert all(isinstance(df["Name"].dtype, pd.StringDtype) for df in frames)
+
+
+def test_unify_frames_int_column_missing_from_one_file():
+    a = pd.DataFrame({"Qty": [1, 2], "Name": ["a", "b"]})
+    b = pd.DataFrame({"Name": ["c"]})
+    merged = pd.concat(unify_frames([a, b]), ignore_index=True)
+    assert str(merged["Qty"].dtype) == "Int64"
+    assert merged["Qty"].tolist()[:2] == [1, 2]
+
+
+def test_unify_frames_blank_column_takes_other_files_type():
+    a = pd.DataFrame({"When": pd.to_datetime(["2024-01-01"])})
+    b = pd.DataFrame({"When": [np.nan]})
+    merged = pd.concat(unify_frames([a, b]), ignore_index=True)
+    assert str(merged["When"].dtype).startswith("datetime64")
@@ -0,0 +1,106 @@
+import os
+
+import pandas as pd
+import pytest
+
+import merge_engine
+from merge_engine import _apply_dtypes, _options_key, _select_sheets, parse_excel_options
+
+
+def test_apply_dtypes_matches_headers_and_renames():
+    df = pd.DataFrame({"A": [1, 2], " code ": [7.0, None]})
+    out = _apply_dtypes(df, {"rename": {"A": "B"}, "dtype": {"B": "str", "CODE": "str"}})
+    assert out["A"].tolist() == ["1", "2"]
+    assert out[" code "].tolist()[0] == "7"
+    assert pd.isna(out[" code "].tolist()[1])
+
+
+def test_apply_dtypes_leaves_exact_matches_to_the_parser():
+    df = pd.DataFrame({"A": [1, 2]})
+    assert _apply_dtypes(df, {"dtype": {"A": "str"}}) is df
+
+
+def test_options_key_includes_rename_only_when_it_matters():
+    assert _options_key({"rename": {"A": "B"}}) == ""
+    assert _options_key({"usecols": ["B"]}) != _options_key({"usecols": ["B"], "rename": {"A": "B"}})
+
+
+def test_parse_excel_options():
+    options = parse_excel_options("Jan, 2", None, "Date,Amount", ["Cust = Customer"], ["Code=str"])
+    assert options == {"sheets": ["Jan", 2], "layout": "stack", "usecols": ["Date", "Amount"],
+                       "rename": {"Cust": "Customer"}, "dtype": {"Code": "str"}}
+    assert parse_excel_options() is None
+    with pytest.raises(ValueError, match="rename expects OLD=NEW"):
+        parse_excel_options(rename=["Cust"])
+
+
+def _cancel_then_rerun(merge, files, output):
+    # Merges the first two files, cancels an append of the rest after the
+    # third file's data went out, then runs the full merge again
+    import threading
+
+    merge(files[:2], output)
+    cancel = threading.Event()
+
+    def progress(text, value=0):
+        if os.path.basename(files[2]) in text:
+            cancel.set()
+
+    with pytest.raises(merge_engine.MergeCancelled):
+        merge(files, output, progress=progress, cancel=cancel)
+    messages = []
+    merge(files, output, progress=lambda text, value=0: messages.append(text))
+    return messages
+
+
+def test_cancelled_pdf_append_is_retried_as_an_append(tmp_path):
+    from merge_bench import make_pdf
+
+    files = [str(tmp_path / f"{i}.pdf") for i in range(4)]
+    for path in files:
+        make_pdf(path, 2)
+    output = str(tmp_path / "out.pdf")
+    messages = _cancel_then_rerun(
+        lambda files, output, **kwargs: merge_engine.merge_pdfs(files, output, incremental=True, **kwargs),
+        files, output)
+    assert [m for m in messages if m.startswith(("Processing", "Appending"))] == \
+        ["Appending 2.pdf...", "Appending 3.pdf..."]
+    from PyPDF2 import PdfReader
+    assert len(PdfReader(output).pages) == 8
+
+
+def test_cancelled_csv_append_is_retried_as_an_append(tmp_path):
+    files = [str(tmp_path / f"{i}.xlsx") for i in range(4)]
+    for i, path in enumerate(files):
+        pd.DataFrame({"A": [i]}).to_excel(path, index=False)
+    output = str(tmp_path / "out.csv")
+    messages = _cancel_then_rerun(
+        lambda files, output, **kwargs: merge_engine.merge_excels(files, output, incremental=True, **kwargs),
+        files, output)
+    assert [m for m in messages if m.startswith(("Writing", "Appending"))] == \
+        ["Appending 2.xlsx...", "Appending 3.xlsx..."]
+    assert pd.read_csv(output)["A"].tolist() == [0, 1, 2, 3]
+
+
+def test_select_sheets_skips_missing_and_prefers_names():
+    assert _select_sheets(["Jan", "Feb"], ["Jan"]) == ["Jan"]
+    assert _select_sheets([2024, 1], ["Jan", "Feb"]) == [1]
+    assert _select_sheets([2024, 0], ["Jan", "2024"]) == ["2024", 0]
+
+
+def test_read_excel_names_the_file_it_cannot_parse(tmp_path):
+    bad = tmp_path / "bad.xlsx"
+    bad.write_text("not a workbook")
+    with pytest.raises(ValueError, match="^bad.xlsx: "):
+        merge_engine._read_excel(str(bad))
+
+
+def test_sheets_missing_from_a_workbook_are_skipped(tmp_path):
+    first, second = str(tmp_path / "first.xlsx"), str(tmp_path / "second.xlsx")
+    with pd.ExcelWriter(first) as writer:
+        pd.DataFrame({"A": [1]}).to_excel(writer, sheet_name="Jan", index=False)
+        pd.DataFrame({"A": [2]}).to_excel(writer, sheet_name="Feb", index=False)
+    pd.DataFrame({"A": [3]}).to_excel(second, sheet_name="Jan", index=False)
+    output = str(tmp_path / "out.csv")
+    merge_engine.merge_excels([first, second], output, options={"sheets": ["Jan", "Feb"]})
+    assert pd.read_csv(output)["Source_Sheet"].tolist() == ["Jan", "Feb", "Jan"]
@@ -0,0 +1,28 @@
+import pytest
+
+from merge_jobs import read_jobs
+
+
+def test_csv_jobs_take_the_cli_excel_options(tmp_path):
+    manifest = tmp_path / "jobs.csv"
+    manifest.write_text("name,mode,output,inputs,sheets,layout,columns,rename,dtype\n"
+                        "acme,excel,out.csv,a.xlsx;b.xlsx,all,separate,\"Date,Amount\","
+                        "Cust=Customer;Qty=Quantity,Code=str\n")
+    job, = read_jobs(str(manifest))
+    assert job["inputs"] == [str(tmp_path / "a.xlsx"), str(tmp_path / "b.xlsx")]
+    assert job["kwargs"]["options"] == {
+        "sheets": "all", "layout": "separate", "usecols": ["Date", "Amount"],
+        "rename": {"Cust": "Customer", "Qty": "Quantity"}, "dtype": {"Code": "str"}}
+
+
+def test_job_pages(tmp_path):
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text('[{"name": "a", "mode": "pdf", "output": "o.pdf", "pages": "1",'
+                        ' "inputs": ["x.pdf", {"path": "y.pdf", "pages": "2-end"}]}]')
+    job, = read_jobs(str(manifest))
+    assert job["kwargs"]["pages"] == {str(tmp_path / "x.pdf"): "1", str(tmp_path / "y.pdf"): "2-end"}
+
+    manifest.write_text('[{"name": "a", "mode": "pdf", "output": "o.pdf", "pages": "x",'
+                        ' "inputs": ["x.pdf"]}]')
+    with pytest.raises(ValueError, match="Job 'a'"):
+        read_jobs(str(manifest))
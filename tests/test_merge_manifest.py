@@ -0,0 +1,32 @@
+from merge_manifest import plan_append, save_manifest
+
+
+def _write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_plan_append_returns_only_new_inputs(tmp_path):
+    a = _write(tmp_path / "a.txt", "a")
+    b = _write(tmp_path / "b.txt", "b")
+    output = _write(tmp_path / "out.txt", "merged")
+
+    new_files, fingerprints = plan_append("pdf", [a], output)
+    assert new_files is None
+    save_manifest(output, "pdf", fingerprints)
+
+    new_files, _ = plan_append("pdf", [a, b], output)
+    assert new_files == [b]
+
+
+def test_plan_append_rebuilds_on_changes(tmp_path):
+    a = _write(tmp_path / "a.txt", "a")
+    b = _write(tmp_path / "b.txt", "b")
+    output = _write(tmp_path / "out.txt", "merged")
+    save_manifest(output, "pdf", plan_append("pdf", [a, b], output)[1])
+
+    assert plan_append("pdf", [b, a], output)[0] is None
+    assert plan_append("excel", [a, b], output)[0] is None
+    assert plan_append("pdf", [a, b], output, file_options={a: "1-2"})[0] is None
+    _write(tmp_path / "a.txt", "changed")
+    assert plan_append("pdf", [a, b], output)[0] is None
@@ -0,0 +1,18 @@
+import pytest
+
+from page_spec import resolve_pages, split_page_spec
+
+
+def test_split_page_spec():
+    assert split_page_spec("1,3-5") == [(1, 1, 0), (3, 5, 0)]
+    assert split_page_spec("end-1@90") == [("end", 1, 90)]
+    with pytest.raises(ValueError):
+        split_page_spec("2@45")
+
+
+def test_resolve_pages_per_file_wins_over_default():
+    assert resolve_pages(["a", "b"], {"b": "2"}, "1") == {"a": "1", "b": "2"}
+    assert resolve_pages(["a", "b"], {}, "1") == "1"
+    assert resolve_pages(["a"], {}, None) is None
+    with pytest.raises(ValueError):
+        resolve_pages(["a"], {"a": "x"})
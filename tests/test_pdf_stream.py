@@ -0,0 +1,132 @@
+import re
+
+import pytest
+from PyPDF2 import PdfReader
+
+from merge_bench import make_pdf
+from pdf_stream import append_pdfs, stream_merge_pdfs
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    # Three inputs of 2, 3 and 1 pages sharing one font and logo image
+    files = []
+    for name, pages in (("a", 2), ("b", 3), ("c", 1)):
+        path = str(tmp_path / f"{name}.pdf")
+        make_pdf(path, pages, page_text_lines=3)
+        files.append(path)
+    return files
+
+
+def page_numbers(output_path):
+    # The "Synthetic page N" each output page was copied from
+    reader = PdfReader(output_path, strict=True)
+    return [int(re.search(rb"Synthetic page (\d+)", page.get_contents().get_data()).group(1))
+            for page in reader.pages]
+
+
+def xref_sections(output_path):
+    # Follows startxref and the /Prev chain, checking that every in-use entry
+    # points at its object. Returns the trailers, newest first.
+    with open(output_path, "rb") as f:
+        data = f.read()
+    offset = int(data[data.rindex(b"startxref") + 9:].split()[0])
+    trailers = []
+    while offset is not None:
+        assert data[offset:offset + 4] == b"xref"
+        table, _, rest = data[offset + 4:].partition(b"trailer")
+        lines = table.split(b"\n")
+        i = 0
+        while i < len(lines):
+            if not lines[i].strip():
+                i += 1
+                continue
+            first, count = map(int, lines[i].split())
+            for idnum, entry in enumerate(lines[i + 1:i + 1 + count], first):
+                position, _, kind = entry.split()
+                if kind == b"n":
+                    assert data[int(position):].startswith(f"{idnum} 0 obj".encode())
+            i += 1 + count
+        trailer = rest[:rest.index(b"startxref")]
+        trailers.append(trailer)
+        prev = re.search(rb"/Prev (\d+)", trailer)
+        offset = int(prev.group(1)) if prev else None
+    return trailers
+
+
+def test_stream_merge_copies_every_page_in_order(corpus, tmp_path):
+    output = str(tmp_path / "out.pdf")
+    report = stream_merge_pdfs(corpus, output)
+    assert report["pages"] == 6
+    assert page_numbers(output) == [0, 1, 0, 1, 2, 0]
+    assert len(xref_sections(output)) == 1
+
+    # A second run over the same output writes the same file again
+    with open(output, "rb") as f:
+        first = f.read()
+    stream_merge_pdfs(corpus, output)
+    with open(output, "rb") as f:
+        assert f.read() == first
+
+
+def test_stream_merge_page_selection_reverses_rotates_and_repeats(corpus, tmp_path):
+    output = str(tmp_path / "out.pdf")
+    stream_merge_pdfs(corpus, output, pages="end-1@90,1")
+    assert page_numbers(output) == [1, 0, 0, 2, 1, 0, 0, 0, 0]
+
+    reader = PdfReader(output, strict=True)
+    rotations = [int(page.get("/Rotate", 0)) for page in reader.pages]
+    assert rotations == [90, 90, 0, 90, 90, 90, 0, 90, 0]
+    # A repeated page is its own page object
+    ids = [page.indirect_reference.idnum for page in reader.pages]
+    assert len(set(ids)) == len(ids)
+
+
+def test_stream_merge_optimize_shares_identical_objects(corpus, tmp_path):
+    plain, optimized = str(tmp_path / "plain.pdf"), str(tmp_path / "optimized.pdf")
+    stream_merge_pdfs(corpus, plain)
+    report = stream_merge_pdfs(corpus, optimized, optimize=True)
+
+    # The font and logo of b and c, and the contents of their pages that
+    # repeat a's (pages 0 and 1 of b, page 0 of c)
+    assert report["duplicate_objects"] == 7
+    assert page_numbers(optimized) == page_numbers(plain)
+    xref_sections(optimized)
+
+    reader = PdfReader(optimized, strict=True)
+    fonts = {page["/Resources"]["/Font"].raw_get("/F1").idnum for page in reader.pages}
+    assert len(fonts) == 1
+    with open(plain, "rb") as f, open(optimized, "rb") as g:
+        assert len(g.read()) < len(f.read())
+
+
+def test_append_adds_updates_after_the_existing_bytes(corpus, tmp_path):
+    output = str(tmp_path / "out.pdf")
+    stream_merge_pdfs(corpus[:1], output)
+    with open(output, "rb") as f:
+        original = f.read()
+
+    append_pdfs(output, corpus[1:2])
+    append_pdfs(output, corpus[2:])
+    assert page_numbers(output) == [0, 1, 0, 1, 2, 0]
+    with open(output, "rb") as f:
+        assert f.read().startswith(original)
+
+    trailers = xref_sections(output)
+    assert len(trailers) == 3
+    sizes = [int(re.search(rb"/Size (\d+)", trailer).group(1)) for trailer in trailers]
+    assert sizes == sorted(sizes, reverse=True)
+    assert len({re.search(rb"/Root (\d+)", trailer).group(1) for trailer in trailers}) == 1
+
+
+def test_append_with_pages_and_optimize_twice(corpus, tmp_path):
+    # make_pdf's own output (written by PyPDF2) takes the updates too
+    output = corpus[0]
+    append_pdfs(output, corpus[1:2], pages="end-1@90,1", optimize=True)
+    report = append_pdfs(output, corpus[1:2], pages="end-1@90,1", optimize=True)
+    assert report["pages"] == 4
+
+    assert page_numbers(output) == [0, 1] + [2, 1, 0, 0] * 2
+    reader = PdfReader(output, strict=True)
+    assert [int(page.get("/Rotate", 0)) for page in reader.pages][2:] == [90, 90, 90, 0] * 2
+    assert len(xref_sections(output)) == 3
@@ -0,0 +1,18 @@
+from session_store import SessionStore
+
+
+def test_selections_are_readable_while_other_writes_are_queued(tmp_path):
+    # The delay keeps the file writes queued; selection reads must not wait for them
+    store = SessionStore(str(tmp_path / "session.db"), delay=1)
+    store.add_files("pdf", ["a.pdf", "b.pdf"])
+    store.save_selection("monthly", "pdf", ["a.pdf", "b.pdf"])
+    assert store.list_selections("pdf") == [("monthly", "pdf", 2)]
+    assert store.load_selection("monthly") == ("pdf", ["a.pdf", "b.pdf"])
+    assert store.ops.unfinished_tasks
+
+    store.delete_selection("monthly")
+    assert store.load_selection("monthly") is None
+    store.close()
+    reopened = SessionStore(str(tmp_path / "session.db"))
+    assert reopened.load_files("pdf") == ["a.pdf", "b.pdf"]
+    reopened.close()
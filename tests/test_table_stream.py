@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+
+from table_stream import ParquetStreamWriter
+
+pytest.importorskip("pyarrow")
+
+
+def test_text_after_numbers_names_the_column(tmp_path):
+    writer = ParquetStreamWriter(str(tmp_path / "out.parquet"), ["Code", "Qty"])
+    writer.append_frame(pd.DataFrame({"Code": [1, 2], "Qty": [3, 4]}))
+    with pytest.raises(ValueError, match="Column 'Code'.*--dtype \"Code=str\""):
+        writer.append_frame(pd.DataFrame({"Code": ["A1"], "Qty": [5]}))
+    writer.close()
+
+
+def test_later_blanks_and_fractions_fit(tmp_path):
+    path = str(tmp_path / "out.parquet")
+    writer = ParquetStreamWriter(path, ["Code", "Qty"])
+    writer.append_frame(pd.DataFrame({"Code": [1, 2], "Qty": [3, 4]}))
+    writer.append_frame(pd.DataFrame({"Code": [2.5], "Qty": [None]}))
+    writer.close()
+    assert pd.read_parquet(path)["Code"].tolist() == [1.0, 2.0, 2.5]
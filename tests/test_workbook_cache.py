@@ -0,0 +1,23 @@
+import pandas as pd
+
+from workbook_cache import WorkbookCache
+
+
+def test_headers_are_recorded_with_the_frames(tmp_path):
+    cache = WorkbookCache(str(tmp_path))
+    sheets = {0: pd.DataFrame({"Name": ["a"], "Total": [1]}), "Extra": pd.DataFrame({3: [1.0]})}
+    cache.put("key", sheets)
+    assert cache.headers("key") == {0: ["Name", "Total"], "Extra": [3]}
+
+    cache.save_index()
+    reopened = WorkbookCache(str(tmp_path))
+    assert reopened.headers("key") == {0: ["Name", "Total"], "Extra": [3]}
+    assert reopened.hits == 0
+
+
+def test_headers_missing_for_unknown_or_removed_entries(tmp_path):
+    cache = WorkbookCache(str(tmp_path))
+    assert cache.headers("nope") is None
+    cache.put("key", {0: pd.DataFrame({"A": [1]})})
+    cache.remove("key")
+    assert cache.headers("key") is None
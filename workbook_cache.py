@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import hashlib
+
+INDEX_FILE = "index.json"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "easymerge", "workbooks")
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class WorkbookCache:
+    # On-disk cache of parsed workbooks. Frames are pickled under a key made
+    # from the file's content hash plus the read options, and a path index
+    # remembers each file's size/mtime/hash so unchanged files are matched
+    # without re-hashing. Entries are evicted least recently used first once
+    # the cache grows past max_bytes.
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.load_index()
+
+    def load_index(self):
+        self.entries = {}
+        self.paths = {}
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE), "r") as f:
+                data = json.load(f)
+            self.entries = data.get("entries", {})
+            self.paths = data.get("paths", {})
+        except (OSError, ValueError):
+            # A missing or damaged index just means a cold cache
+            pass
+
+    def save_index(self):
+        index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"entries": self.entries, "paths": self.paths}, f)
+        os.replace(tmp_path, index_path)
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def key_for(self, excel_path, variant=""):
+        # Trust size + mtime for files seen before, hash the content otherwise
+        path = os.path.abspath(excel_path)
+        st = os.stat(path)
+        known = self.paths.get(path)
+        if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+            content_hash = known["sha256"]
+        else:
+            content_hash = file_sha256(path)
+            self.paths[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": content_hash}
+
+        return hashlib.sha256(f"{content_hash}:{variant}".encode()).hexdigest()
+
+    def get(self, key):
+        import pandas as pd
+
+        if key not in self.entries or not os.path.exists(self.entry_path(key)):
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+
+        try:
+            sheets = pd.read_pickle(self.entry_path(key))
+        except Exception:
+            self.remove(key)
+            self.misses += 1
+            return None
+
+        self.entries[key]["last_used"] = time.time()
+        self.hits += 1
+        return sheets
+
+    def put(self, key, sheets):
+        import pandas as pd
+
+        entry_path = self.entry_path(key)
+        tmp_path = entry_path + ".tmp"
+        pd.to_pickle(sheets, tmp_path)
+        os.replace(tmp_path, entry_path)
+
+        self.entries[key] = {"bytes": os.path.getsize(entry_path), "last_used": time.time()}
+        # The headers are kept in the index too, so merges that only need the
+        # columns up front don't have to load the frames
+        headers = [[name, list(df.columns)] for name, df in sheets.items()]
+        plain = (str, int, float)
+        if all(isinstance(name, plain) and all(isinstance(c, plain) for c in columns)
+               for name, columns in headers):
+            self.entries[key]["headers"] = headers
+        self.evict(keep=key)
+
+    def headers(self, key):
+        # {sheet name: columns} as recorded by put(), or None
+        entry = self.entries.get(key)
+        if entry is None or "headers" not in entry or not os.path.exists(self.entry_path(key)):
+            return None
+        return {name: columns for name, columns in entry["headers"]}
+
+    def remove(self, key):
+        self.entries.pop(key, None)
+        try:
+            os.remove(self.entry_path(key))
+        except OSError:
+            pass
+
+    def evict(self, keep=None):
+        total = self.total_bytes()
+        by_age = sorted(self.entries.items(), key=lambda item: item[1]["last_used"])
+        for key, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.remove(key)
+            total -= entry["bytes"]
+
+    def total_bytes(self):
+        return sum(entry["bytes"] for entry in self.entries.values())
+
+    def info(self):
+        return {
+            "cache_dir": self.cache_dir,
+            "entries": len(self.entries),
+            "bytes": self.total_bytes(),
+            "max_bytes": self.max_bytes,
+            "known_paths": len(self.paths),
+        }
+
+    def clear(self):
+        # Also sweeps entries a crashed run never recorded in the index
+        for name in os.listdir(self.cache_dir):
+            if name.endswith((".pkl", ".tmp")):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+        self.entries = {}
+        self.paths = {}
+        self.save_index()